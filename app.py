@@ -5,15 +5,23 @@ Visibility Scoring Lead Magnet — Flask Application
 import io
 import logging
 import os
+import sqlite3
 import threading
+import time
 import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as RenderTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable
 
-import requests
+import click
 from dotenv import load_dotenv
 from flask import (
     Flask,
+    Response,
     abort,
     flash,
+    jsonify,
     redirect,
     render_template,
     request,
@@ -23,9 +31,16 @@ from flask import (
 
 load_dotenv()
 
-from utils.pdf_generator import generate_pdf_bytes
+from utils import metrics, places_usage
+from utils.pdf_renderer import cached_pdf, render_pdf_cached, report_key, warm_up
 from utils.places_api import build_full_report_data
-from utils.scoring import calculate_score
+from utils.job_store import JobStore
+from utils.results_store import create_results_store
+from utils.scoring import calculate_numeric_score, score_total
+from utils.singleflight import SingleFlight
+from utils.sqlite_tx import RESULTS_DB_PATH
+from utils.webhook_outbox import WebhookOutbox
+from utils.webhook_sender import BoundedWebhookSender
 
 # ── App setup ──────────────────────────────────────────────────────────────────
 app = Flask(__name__)
@@ -39,71 +54,189 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Simple in-memory store: token → result dict
-# PDFs are stored as bytes so no filesystem is needed (works on Railway).
-_results_store: dict[str, dict] = {}
+# Bounded store: token → result dict. The default SQLite backend lives on
+# local disk and is shared by every gunicorn worker, so tokens resolve on any
+# of them; RESULTS_STORE_BACKEND=memory keeps results in-process instead.
+_results_store = create_results_store(
+    os.getenv("RESULTS_STORE_BACKEND", "sqlite"),
+    max_entries=int(os.getenv("RESULTS_MAX_ENTRIES", "500")),
+    max_bytes=int(os.getenv("RESULTS_MAX_BYTES", str(64 * 1024 * 1024))),
+    ttl=float(os.getenv("RESULTS_TTL", str(6 * 3600))),
+)
 
 
 # ── GHL Webhook ────────────────────────────────────────────────────────────────
+# WEBHOOK_DELIVERY picks how leads reach GHL:
+#   outbox   (default) durable SQLite outbox, POSTed by a few delivery threads
+#            per worker with retries and backoff. Failed deliveries can be
+#            re-queued with `flask --app app replay-webhooks`.
+#   direct   bounded in-memory queue and thread pool; no retries, and leads
+#            are dropped (and counted) when the queue is full.
+WEBHOOK_DELIVERY = os.getenv("WEBHOOK_DELIVERY", "outbox")
+if WEBHOOK_DELIVERY not in ("outbox", "direct"):
+    raise ValueError(f"Unknown WEBHOOK_DELIVERY: {WEBHOOK_DELIVERY!r}")
+
+
+def _ghl_webhook_url() -> str:
+    url = os.getenv("GHL_WEBHOOK_URL", "")
+    return "" if "REPLACE_ME" in url else url
+
+
+_webhook_outbox = WebhookOutbox(
+    path=os.getenv("WEBHOOK_OUTBOX_PATH", RESULTS_DB_PATH),
+    url=_ghl_webhook_url,
+    workers=int(os.getenv("WEBHOOK_WORKERS", "2")),
+    # GHL inbound webhooks take one contact per call; raise only for endpoints
+    # that accept a JSON array
+    batch_size=int(os.getenv("WEBHOOK_BATCH_SIZE", "1")),
+    max_attempts=int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8")),
+)
+_webhook_sender = BoundedWebhookSender(
+    url=_ghl_webhook_url,
+    workers=int(os.getenv("WEBHOOK_WORKERS", "2")),
+    queue_size=int(os.getenv("WEBHOOK_QUEUE_SIZE", "100")),
+)
 
-def _fire_ghl_webhook(payload: dict) -> None:
-    """Fire-and-forget POST to the GHL webhook (runs in a daemon thread)."""
-    webhook_url = os.getenv("GHL_WEBHOOK_URL", "")
-    if not webhook_url or "REPLACE_ME" in webhook_url:
+
+def queue_webhook(payload: dict) -> None:
+    """
+    Hand a lead to the configured webhook delivery; never blocks on GHL.
+    A lead the outbox cannot store is logged and counted as dropped — the
+    analysis itself has already succeeded.
+    """
+    if not _ghl_webhook_url():
         logger.warning("GHL webhook URL not configured — skipping.")
         return
+    if WEBHOOK_DELIVERY == "direct":
+        _webhook_sender.submit(payload)
+        return
     try:
-        resp = requests.post(webhook_url, json=payload, timeout=10)
-        resp.raise_for_status()
-        logger.info("GHL webhook fired — status %s", resp.status_code)
-    except requests.RequestException as exc:
-        logger.error("GHL webhook failed: %s", exc)
+        _webhook_outbox.enqueue(payload)
+    except sqlite3.Error as exc:
+        logger.error("GHL webhook outbox write failed — dropping lead: %s", exc)
+        metrics.inc(metrics.WEBHOOK_DELIVERIES, result="dropped")
+
+
+@app.before_request
+def _start_webhook_outbox() -> None:
+    """
+    Start this worker's outbox delivery threads on its first request, so
+    anything a previous worker left undelivered is drained. CLI commands
+    import the app too and must not start them.
+    """
+    if WEBHOOK_DELIVERY == "outbox" and _ghl_webhook_url():
+        _webhook_outbox.start()
+
+
+@app.cli.command("replay-webhooks")
+@click.option("--id", "ids", type=int, multiple=True, help="Replay only these outbox ids.")
+@click.option("--list", "list_only", is_flag=True, help="Show failed deliveries without replaying.")
+def replay_webhooks(ids: tuple[int, ...], list_only: bool) -> None:
+    """Re-queue failed webhook deliveries."""
+    if list_only:
+        for row in _webhook_outbox.failed():
+            click.echo(f"{row['id']:>6}  attempts={row['attempts']}  {row['error']}")
+        click.echo(str(_webhook_outbox.stats()))
+        return
+    replayed = _webhook_outbox.replay(list(ids) or None)
+    click.echo(f"Re-queued {replayed} failed webhook deliveries.")
 
 
-def fire_webhook_async(payload: dict) -> None:
-    t = threading.Thread(target=_fire_ghl_webhook, args=(payload,), daemon=True)
-    t.start()
+# ── Analysis jobs ─────────────────────────────────────────────────────────────
+# /analyze only enqueues; the Places lookups and scoring run on a background
+# executor. Stages match the step-N rows animated by main.js.
+JOB_STAGES = ("find_business", "competitors", "score", "report")
+JOB_RETENTION_SECONDS = 15 * 60
 
+_job_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("ANALYZE_WORKERS", "4")),
+    thread_name_prefix="analyze",
+)
+# Job state lives next to the results so any worker can answer a status poll
+_jobs = JobStore(ttl=JOB_RETENTION_SECONDS, path=RESULTS_DB_PATH)
 
-# ── Routes ─────────────────────────────────────────────────────────────────────
+ANALYSES = metrics.counter(
+    "visibility_analyses_total", "Finished analyses by status (done, not_found, error).",
+)
 
-@app.route("/")
-def index():
-    return render_template("index.html")
 
+def _wants_json() -> bool:
+    best = request.accept_mimetypes.best_match(["text/html", "application/json"])
+    return best == "application/json"
 
-@app.route("/analyze", methods=["POST"])
-def analyze():
-    # ── Collect form data ──────────────────────────────────────────────────────
-    first_name    = request.form.get("first_name", "").strip()
-    email         = request.form.get("email", "").strip()
-    phone         = request.form.get("phone", "").strip()
-    business_name = request.form.get("business_name", "").strip()
-    city          = request.form.get("city", "").strip()
 
-    if not all([first_name, email, business_name, city]):
-        flash("Please fill in all required fields.", "error")
-        return redirect(url_for("index"))
+def _get_job(token: str) -> dict | None:
+    return _jobs.get(token)
 
-    # ── Fetch data from Google Places ──────────────────────────────────────────
+
+def _update_job(token: str, **fields) -> None:
+    _jobs.update(token, **fields)
+
+
+def _submit_job(token: str, lead: dict) -> Future:
+    _jobs.create(token, {"status": "queued", "stage": 0, "error": None})
+    return _job_executor.submit(_run_job, token, lead)
+
+
+def _run_job(token: str, lead: dict) -> None:
+    def stage_done(stage: str) -> None:
+        _update_job(token, stage=JOB_STAGES.index(stage) + 1)
+
+    _update_job(token, status="running")
     try:
-        report_data = build_full_report_data(business_name, city)
+        with metrics.timed(metrics.STAGE_SECONDS, stage="analysis"):
+            result = _run_analysis(lead, stage_done)
+            _results_store.put(token, result)
     except ValueError as exc:
-        flash(str(exc), "error")
-        return redirect(url_for("index"))
+        metrics.inc(ANALYSES, status="not_found")
+        _update_job(token, status="failed", error=str(exc))
+        return
     except Exception as exc:
         logger.exception("Unexpected error fetching Places data: %s", exc)
-        flash(
-            "We encountered an error connecting to Google Places. Please try again shortly.",
-            "error",
+        metrics.inc(ANALYSES, status="error")
+        _update_job(
+            token,
+            status="failed",
+            error="We encountered an error connecting to Google Places. Please try again shortly.",
         )
-        return redirect(url_for("index"))
+        return
+    # Only once the result is stored, so a webhook problem can't fail the job
+    queue_webhook({
+        "first_name":    lead["first_name"],
+        "email":         lead["email"],
+        "phone":         lead["phone"],
+        "business_name": lead["business_name"],
+        "city":          lead["city"],
+        "score":         result["scores"]["total"],
+        "grade":         result["scores"]["grade"],
+    })
+    metrics.inc(ANALYSES, status="done")
+    _update_job(token, status="done")
+
+
+def _run_analysis(lead: dict, stage_done: Callable[[str], None]) -> dict:
+    """
+    Run the full pipeline for one lead and return the dict kept in
+    _results_store. Raises ValueError if the business cannot be found.
+    """
+    # ── Fetch data from Google Places ──────────────────────────────────────────
+    # Billable Places calls made for this lead; a fetch shared with a
+    # concurrent identical analysis is counted once, by whoever ran it
+    with places_usage.track_usage() as usage:
+        report_data = build_full_report_data(
+            lead["business_name"],
+            lead["city"],
+            on_business_found=lambda: stage_done("find_business"),
+        )
+    stage_done("competitors")
 
     business    = report_data["business"]
     competitors = report_data["competitors"]
 
     # ── Score ──────────────────────────────────────────────────────────────────
-    competitor_scores = [calculate_score(c, [])["total"] for c in competitors]
+    score_started = time.perf_counter()
+    # Memoised per profile, so a competitor seen in earlier reports is free
+    competitor_scores = [score_total(c) for c in competitors]
 
     # Top competitor by score (used in personalised copy)
     top_competitor = None
@@ -116,7 +249,8 @@ def analyze():
         top_competitor = competitors[top_idx]
         top_competitor_name = top_competitor["name"]
 
-    scores = calculate_score(business, competitors, top_competitor_name=top_competitor_name)
+    # Recommendation texts are only shown in the PDF, which builds them itself
+    scores = calculate_numeric_score(business, competitors)
 
     if competitor_scores:
         competitors_beating = sum(1 for s in competitor_scores if s > scores["total"])
@@ -132,35 +266,13 @@ def analyze():
                 review_ratio_text = "dubbelt så många kunder från Google"
             elif ratio >= 1.5:
                 review_ratio_text = "50% fler kunder från Google"
+    metrics.observe(metrics.STAGE_SECONDS, time.perf_counter() - score_started, stage="calculate_score")
+    stage_done("score")
 
-    # ── Generate PDF (stored in memory as bytes) ───────────────────────────────
-    pdf_bytes = None
-    try:
-        pdf_bytes = generate_pdf_bytes(first_name, business, scores, competitors)
-        logger.info("PDF generated (%d bytes)", len(pdf_bytes))
-    except Exception as exc:
-        logger.exception("PDF generation failed: %s", exc)
-        # Non-fatal — results page still renders without download button
-
-    # ── GHL Webhook ────────────────────────────────────────────────────────────
-    fire_webhook_async({
-        "first_name":    first_name,
-        "email":         email,
-        "phone":         phone,
-        "business_name": business_name,
-        "city":          city,
-        "score":         scores["total"],
-        "grade":         scores["grade"],
-    })
+    stage_done("report")
 
-    # ── Store results ──────────────────────────────────────────────────────────
-    token = uuid.uuid4().hex
-    _results_store[token] = {
-        "first_name":    first_name,
-        "email":         email,
-        "phone":         phone,
-        "business_name": business_name,
-        "city":          city,
+    return {
+        **lead,
         "business":      business,
         "competitors":        competitors,
         "competitor_scores":  competitor_scores,
@@ -168,22 +280,196 @@ def analyze():
         "top_competitor_name": top_competitor_name,
         "competitors_beating": competitors_beating,
         "review_ratio_text":  review_ratio_text,
-        "pdf_bytes":     pdf_bytes,
+        "places_usage":       usage.summary(),
+        # True when the analysis deadline cut competitor collection short
+        "competitors_partial": report_data["competitors_partial"],
+        # The PDF is rendered on the first /download hit (most leads never
+        # click it) and stored once per distinct report in the PDF cache.
+        "pdf_key":       None,
+    }
+
+
+# ── PDF ────────────────────────────────────────────────────────────────────────
+
+_pdf_flight = SingleFlight()
+_pdf_warm_pid: int | None = None
+
+
+@app.before_request
+def _warm_pdf_pool() -> None:
+    """
+    Start this worker's render processes in the background on its first
+    request. Spawned workers otherwise start on demand, and the first
+    download would pay for the spawn plus the ReportLab import.
+    """
+    global _pdf_warm_pid
+    if _pdf_warm_pid != os.getpid():
+        _pdf_warm_pid = os.getpid()
+        threading.Thread(target=warm_up, name="pdf-warm-up", daemon=True).start()
+
+
+def _report_pdf(token: str, data: dict) -> bytes | None:
+    """
+    Return the PDF for a stored result, rendering it if needed.
+    Identical reports share one cached blob, and concurrent first downloads
+    of the same report share a single render.
+    """
+    if data.get("pdf_failed"):
+        return None
+    if data.get("pdf_key"):
+        pdf_bytes = cached_pdf(data["pdf_key"])
+        if pdf_bytes:
+            return pdf_bytes
+
+    try:
+        key, pdf_bytes = _pdf_flight.do(
+            report_key(data["business"], data["scores"], data["competitors"]),
+            render_pdf_cached,
+            data["first_name"],
+            data["business"],
+            data["scores"],
+            data["competitors"],
+            # Already scored during analysis — the PDF doesn't score them again
+            data["competitor_scores"],
+            data["top_competitor_name"],
+        )
+        logger.info("PDF ready (%d bytes)", len(pdf_bytes))
+    except (RenderTimeout, BrokenProcessPool):
+        # Overload or a crashed render worker (the pool is rebuilt), not a
+        # broken report — let the next download try again
+        raise
+    except Exception as exc:
+        logger.exception("PDF generation failed: %s", exc)
+        # Non-fatal — results page hides the download button from now on
+        _results_store.update(token, pdf_failed=True)
+        return None
+
+    _results_store.update(token, pdf_key=key)
+    return pdf_bytes
+
+
+# ── Metrics ────────────────────────────────────────────────────────────────────
+# Counters and histograms are recorded where the work happens (see
+# utils/metrics.py); the values below already live in shared SQLite tables
+# and are read at scrape time. Set METRICS_TOKEN to require a bearer token.
+
+RESULTS_ENTRIES = metrics.gauge("visibility_results_store_entries", "Stored report results.")
+RESULTS_BYTES = metrics.gauge("visibility_results_store_bytes", "Approximate size of stored results.")
+RESULTS_EVICTIONS = metrics.counter(
+    "visibility_results_store_evictions_total", "Results evicted by reason.",
+)
+WEBHOOK_OUTBOX_ROWS = metrics.gauge(
+    "visibility_webhook_outbox_rows", "Webhook outbox rows by status.",
+)
+
+
+def _collect_metrics() -> list[tuple[str, dict, float]]:
+    stats = _results_store.stats()
+    samples = [
+        (RESULTS_ENTRIES, {}, stats["entries"]),
+        (RESULTS_BYTES, {}, stats["bytes"]),
+        *((RESULTS_EVICTIONS, {"reason": r}, n) for r, n in stats["evictions"].items()),
+    ]
+    if WEBHOOK_DELIVERY == "outbox":
+        samples += [
+            (WEBHOOK_OUTBOX_ROWS, {"status": status}, n)
+            for status, n in _webhook_outbox.stats().items()
+        ]
+    return samples
+
+
+metrics.register_collector(_collect_metrics)
+
+
+@app.cli.command("places-usage")
+@click.option("--days", default=30, show_default=True, help="How many days back to show.")
+def places_usage_report(days: int) -> None:
+    """Daily Places API call counts per SKU and estimated cost."""
+    for row in places_usage.daily_usage(days):
+        calls = "  ".join(f"{sku}={n}" for sku, n in sorted(row["calls"].items()))
+        click.echo(f"{row['day']}  ${row['estimated_cost_usd']:>8.2f}  {calls}")
+
+
+# ── Routes ─────────────────────────────────────────────────────────────────────
+
+@app.route("/")
+def index():
+    return render_template("index.html")
+
+
+@app.route("/analyze", methods=["POST"])
+def analyze():
+    wants_json = _wants_json()
+
+    # ── Collect form data ──────────────────────────────────────────────────────
+    lead = {
+        "first_name":    request.form.get("first_name", "").strip(),
+        "email":         request.form.get("email", "").strip(),
+        "phone":         request.form.get("phone", "").strip(),
+        "business_name": request.form.get("business_name", "").strip(),
+        "city":          request.form.get("city", "").strip(),
     }
 
+    if not all([lead["first_name"], lead["email"], lead["business_name"], lead["city"]]):
+        if wants_json:
+            return jsonify(error="Please fill in all required fields."), 400
+        flash("Please fill in all required fields.", "error")
+        return redirect(url_for("index"))
+
+    # ── Enqueue the analysis ───────────────────────────────────────────────────
+    token = uuid.uuid4().hex
+    future = _submit_job(token, lead)
+
+    if wants_json:
+        return jsonify(
+            token=token,
+            status_url=url_for("job_status", token=token),
+            results_url=url_for("results", token=token),
+        ), 202
+
+    # Without JavaScript there is nothing to poll — wait for the job inline
+    future.result()
+    job = _get_job(token)
+    if job and job["status"] == "failed":
+        flash(job["error"], "error")
+        return redirect(url_for("index"))
     return redirect(url_for("results", token=token))
 
 
+@app.route("/jobs/<token>")
+def job_status(token: str):
+    job = _get_job(token)
+    if job is None:
+        return jsonify(error="Unknown job."), 404
+    return jsonify(
+        status=job["status"],
+        stage=job["stage"],
+        stages=list(JOB_STAGES),
+        error=job["error"],
+        results_url=url_for("results", token=token),
+    )
+
+
 @app.route("/results/<token>")
 def results(token: str):
     data = _results_store.get(token)
     if not data:
+        job = _get_job(token)
+        if job and job["status"] == "failed":
+            flash(job["error"], "error")
+            return redirect(url_for("index"))
+        if job and job["status"] in ("queued", "running"):
+            return render_template(
+                "error.html", message="Din rapport håller fortfarande på att tas fram."
+            ), 202
+        # Done, but the result has since been evicted or expired
         abort(404)
-    # Pass pdf_path as truthy/falsy so template can show/hide download button
+    # Pass pdf_path as truthy/falsy so template can show/hide download button.
+    # The PDF itself is rendered lazily, so the button shows unless rendering failed.
     return render_template(
         "results.html",
         token=token,
-        pdf_path=bool(data.get("pdf_bytes")),
+        pdf_path=not data.get("pdf_failed"),
         **{k: v for k, v in data.items() if k != "pdf_bytes"},
     )
 
@@ -193,7 +479,14 @@ def download(token: str):
     data = _results_store.get(token)
     if not data:
         abort(404)
-    pdf_bytes = data.get("pdf_bytes")
+    try:
+        pdf_bytes = _report_pdf(token, data)
+    except (RenderTimeout, BrokenProcessPool) as exc:
+        logger.error("PDF render failed for %s: %r", token, exc)
+        return render_template(
+            "error.html",
+            message="Rapporten tar längre tid än väntat att ta fram. Försök igen om en stund.",
+        ), 503
     if not pdf_bytes:
         abort(404)
     business_name = data["business"]["name"].replace(" ", "_")
@@ -205,6 +498,14 @@ def download(token: str):
     )
 
 
+@app.route("/metrics")
+def metrics_endpoint():
+    token = os.getenv("METRICS_TOKEN", "")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        abort(404)
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 # ── Error handlers ─────────────────────────────────────────────────────────────
 
 @app.errorhandler(404)
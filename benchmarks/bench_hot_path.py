@@ -0,0 +1,207 @@
+"""
+Micro-benchmarks for the per-report hot path.
+
+Times calculate_score, _filter_local_competitors, _normalise_details and
+generate_pdf_bytes on seeded synthetic data (benchmarks/synthetic.py) at
+several batch sizes, and writes the results as JSON so two runs can be
+compared:
+
+    python -m benchmarks.bench_hot_path --output before.json
+    # ...change something...
+    python -m benchmarks.bench_hot_path --output after.json --compare before.json
+
+A batch of size n means: n profiles scored (recommendations included, as the
+results page reads them), one candidate list of n filtered, n raw payloads
+normalised, or n PDFs rendered. --compare exits with status 1 if any case
+got slower than --threshold.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks import synthetic
+from utils.pdf_generator import generate_pdf_bytes
+from utils.places_api import _filter_local_competitors, _normalise_details
+from utils.scoring import calculate_score, score_total
+
+DEFAULT_SIZES = [1, 10, 100, 1000]
+# PDF renders take milliseconds each, so they get smaller batches
+DEFAULT_PDF_SIZES = [1, 5, 20]
+
+
+def _case_calculate_score(n: int, seed: int):
+    reports = synthetic.reports(n, seed)
+
+    def run():
+        for business, competitors in reports:
+            list(calculate_score(business, competitors, competitors[0]["name"])["recommendations"])
+    return run
+
+
+def _case_filter_local_competitors(n: int, seed: int):
+    candidates = synthetic.profiles(n, seed)
+    own_review_count = candidates[0]["review_count"]
+
+    def run():
+        _filter_local_competitors(candidates, own_review_count)
+    return run
+
+
+def _case_normalise_details(n: int, seed: int):
+    payloads = synthetic.detail_payloads(n, seed)
+
+    def run():
+        for place_id, result in payloads:
+            _normalise_details(place_id, result)
+    return run
+
+
+def _case_generate_pdf_bytes(n: int, seed: int):
+    reports = [
+        (business, competitors,
+         calculate_score(business, competitors, competitors[0]["name"]),
+         [score_total(c) for c in competitors])
+        for business, competitors in synthetic.reports(n, seed)
+    ]
+
+    def run():
+        for business, competitors, scores, competitor_scores in reports:
+            generate_pdf_bytes("Erik", business, scores, competitors, competitor_scores)
+    return run
+
+
+CASES = {
+    "calculate_score": _case_calculate_score,
+    "_filter_local_competitors": _case_filter_local_competitors,
+    "_normalise_details": _case_normalise_details,
+    "generate_pdf_bytes": _case_generate_pdf_bytes,
+}
+
+
+def _measure(run, repeats: int, min_time: float) -> list[float]:
+    """
+    Per-call timings of `run`. Each sample loops run() until it has taken at
+    least `min_time` seconds, so tiny batches are not dominated by timer noise.
+    """
+    run()  # warm-up
+    loops = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            run()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_time or loops >= 1_000_000:
+            break
+        loops *= 10
+    samples = [elapsed / loops]
+    for _ in range(repeats - 1):
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            run()
+        samples.append((time.perf_counter() - t0) / loops)
+    return samples
+
+
+def run_suite(cases: list[str], sizes: list[int], pdf_sizes: list[int],
+              repeats: int, min_time: float, seed: int) -> dict:
+    results = []
+    for name in cases:
+        for n in (pdf_sizes if name == "generate_pdf_bytes" else sizes):
+            samples = _measure(CASES[name](n, seed), repeats, min_time)
+            median = statistics.median(samples)
+            results.append({
+                "name": name,
+                "size": n,
+                "repeats": repeats,
+                "median_s": median,
+                "min_s": min(samples),
+                "stdev_s": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+                "per_item_us": median / n * 1e6,
+            })
+            print(f"{name:<28} n={n:<5} median {median * 1000:10.4f} ms   "
+                  f"{median / n * 1e6:10.2f} µs/item")
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> bool:
+    """
+    Print per-case changes against a baseline, using the fastest sample of
+    each run (the least noisy estimate). Returns True if any case regressed.
+    """
+    old = {(r["name"], r["size"]): r for r in baseline["results"]}
+    regressed = False
+    print(f"\n{'case':<36} {'baseline':>12} {'current':>12} {'change':>9}")
+    for r in current["results"]:
+        before = old.get((r["name"], r["size"]))
+        if before is None:
+            continue
+        change = r["min_s"] / before["min_s"] - 1
+        flag = ""
+        if change > threshold:
+            flag, regressed = "  REGRESSION", True
+        print(f"{r['name'] + ' n=' + str(r['size']):<36} "
+              f"{before['min_s'] * 1000:10.4f}ms {r['min_s'] * 1000:10.4f}ms "
+              f"{change * 100:+8.1f}%{flag}")
+    return regressed
+
+
+def _sizes(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cases", default=",".join(CASES),
+                        help="comma-separated subset of: " + ", ".join(CASES))
+    parser.add_argument("--sizes", type=_sizes, default=DEFAULT_SIZES)
+    parser.add_argument("--pdf-sizes", type=_sizes, default=DEFAULT_PDF_SIZES)
+    parser.add_argument("--repeats", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="minimum seconds per sample (default 0.05)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="slowdown that counts as a regression (default 0.10)")
+    args = parser.parse_args()
+
+    cases = [c for c in args.cases.split(",") if c]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+
+    # The competitor filter logs every call; keep the output readable
+    logging.getLogger("utils.places_api").setLevel(logging.ERROR)
+
+    current = run_suite(cases, args.sizes, args.pdf_sizes, args.repeats, args.min_time, args.seed)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"\nwrote {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(current, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Render benchmark for the precompiled PDF style catalogue.
+
+Compares generate_pdf_bytes with the import-time catalogue against the same
+render plus a full rebuild of every ParagraphStyle/TableStyle, which is what
+each render used to pay (_make_styles() plus per-row styles).
+
+    python -m benchmarks.bench_pdf_styles [--renders 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+from utils import pdf_generator
+from utils.pdf_generator import generate_pdf_bytes
+from utils.scoring import calculate_score
+
+BUSINESS = {
+    "name": "Eriks VVS", "formatted_address": "Storgatan 1, Stockholm",
+    "rating": 4.2, "review_count": 37, "photo_count": 6,
+    "has_website": True, "has_phone": True, "has_hours": False,
+    "has_specific_categories": True, "has_description": False,
+    "reviews_returned": 5, "reviews_responded": 1,
+}
+COMPETITORS = [
+    dict(BUSINESS, name=f"Konkurrent {i}", rating=3.6 + i / 10, review_count=20 * i, photo_count=2 * i)
+    for i in range(1, 6)
+]
+
+
+def _rebuild_catalogue() -> None:
+    pdf_generator._build_styles()
+    pdf_generator._build_score_styles()
+    pdf_generator._build_table_styles()
+    pdf_generator._build_grade_table_styles()
+
+
+def _time(fns: list, n: int) -> list[list[float]]:
+    """Time each fn n times, interleaved so drift affects all of them equally."""
+    samples = [[] for _ in fns]
+    for _ in range(n):
+        for fn, out in zip(fns, samples):
+            t0 = time.perf_counter()
+            fn()
+            out.append(time.perf_counter() - t0)
+    return samples
+
+
+def _summary(label: str, samples: list[float]) -> str:
+    ms = [s * 1000 for s in samples]
+    return (f"{label:<28} median {statistics.median(ms):7.3f} ms   "
+            f"mean {statistics.fmean(ms):7.3f} ms   min {min(ms):7.3f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--renders", type=int, default=200)
+    args = parser.parse_args()
+
+    scores = calculate_score(BUSINESS, COMPETITORS, "Konkurrent 5")
+
+    def render():
+        generate_pdf_bytes("Erik", BUSINESS, scores, COMPETITORS)
+
+    def render_with_rebuild():
+        _rebuild_catalogue()
+        render()
+
+    # Warm-up: font metrics, imports, caches
+    for _ in range(5):
+        render_with_rebuild()
+
+    rebuild, cached, rebuilt = _time(
+        [_rebuild_catalogue, render, render_with_rebuild], args.renders,
+    )
+
+    print(f"{args.renders} renders each")
+    print(_summary("style construction only", rebuild))
+    print(_summary("render (catalogue)", cached))
+    print(_summary("render (rebuild styles)", rebuilt))
+    saved = statistics.median(rebuilt) - statistics.median(cached)
+    print(f"saved per render: {saved * 1000:.3f} ms "
+          f"({saved / statistics.median(rebuilt) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
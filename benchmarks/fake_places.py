@@ -0,0 +1,345 @@
+"""
+Local stand-in for the legacy Places web service, for offline load tests.
+
+Serves textsearch/json, details/json and nearbysearch/json under the same
+paths as maps.googleapis.com/maps/api/place, so pointing the app at it is one
+environment variable:
+
+    python -m benchmarks.fake_places --port 8765 --latency lognormal:120,0.5
+    PLACES_BASE_URL=http://127.0.0.1:8765/maps/api/place python app.py
+
+Data sources (--mode):
+  synthetic  deterministic data from benchmarks/synthetic.py (default). The
+             same query, place_id or search area always gets the same answer.
+  replay     responses recorded earlier with --mode record, looked up by
+             endpoint and query parameters (the API key is ignored).
+  record     forwards every call to Google (GOOGLE_PLACES_API_KEY must be
+             set) and appends the responses to the fixture file.
+
+Fault injection, applied before the data source:
+  --latency SPEC | ENDPOINT=SPEC   fixed:MS, uniform:LO,HI, normal:MEAN,SD
+                                   or lognormal:MEDIAN,SIGMA (milliseconds);
+                                   ENDPOINT is textsearch, details or nearbysearch
+  --error-rate P                   fraction answered with an HTTP error
+  --error-codes 500,503            HTTP codes to pick from for those errors
+  --status STATUS=P                fraction answered with HTTP 200 and a Places
+                                   error status, e.g. OVER_QUERY_LIMIT=0.01
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from flask import Flask, jsonify, request
+
+from benchmarks import synthetic
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_BASE_URL = "https://maps.googleapis.com/maps/api/place"
+ENDPOINTS = ("textsearch", "details", "nearbysearch")
+NEARBY_RESULTS = 20
+
+# What an unknown fixture answers with, per endpoint
+_MISSING = {
+    "textsearch": {"status": "ZERO_RESULTS", "results": []},
+    "nearbysearch": {"status": "ZERO_RESULTS", "results": []},
+    "details": {"status": "NOT_FOUND"},
+}
+
+
+# ── Latency and fault injection ────────────────────────────────────────────────
+
+def parse_latency(spec: str):
+    """Turn a latency spec into a function rng → seconds."""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    samplers = {
+        "fixed":     (1, lambda rng, ms: ms),
+        "uniform":   (2, lambda rng, lo, hi: rng.uniform(lo, hi)),
+        "normal":    (2, lambda rng, mean, sd: max(rng.gauss(mean, sd), 0.0)),
+        "lognormal": (2, lambda rng, median, sigma: rng.lognormvariate(0.0, sigma) * median),
+    }
+    if kind not in samplers or len(values) != samplers[kind][0]:
+        raise ValueError(f"Invalid latency spec: {spec!r}")
+    sample = samplers[kind][1]
+    return lambda rng: sample(rng, *values) / 1000
+
+
+class Faults:
+    """Per-endpoint latency plus random HTTP errors and Places error statuses."""
+
+    def __init__(
+        self,
+        latency: dict[str, str],
+        error_rate: float = 0.0,
+        error_codes: tuple[int, ...] = (500, 503),
+        statuses: dict[str, float] | None = None,
+        seed: int = 0,
+    ):
+        default = latency.get("*", "fixed:0")
+        self.latency = {e: parse_latency(latency.get(e, default)) for e in ENDPOINTS}
+        self.error_rate = error_rate
+        self.error_codes = error_codes
+        self.statuses = statuses or {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def apply(self, endpoint: str):
+        """Sleep, then return a response to send instead of the data, or None."""
+        with self._lock:
+            delay = self.latency[endpoint](self._rng)
+            roll = self._rng.random()
+            code = self._rng.choice(self.error_codes)
+        time.sleep(delay)
+
+        if roll < self.error_rate:
+            return jsonify(error="injected failure"), code
+        roll -= self.error_rate
+        for status, rate in self.statuses.items():
+            if roll < rate:
+                return jsonify(status=status, error_message="Injected by fake_places")
+            roll -= rate
+        return None
+
+
+# ── Data sources ──────────────────────────────────────────────────────────────
+
+def _rng_for(seed: int, *parts) -> random.Random:
+    digest = hashlib.sha256(repr((seed, *parts)).encode()).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def _place_id(seed: int, *parts) -> str:
+    return "fake_" + hashlib.sha256(repr((seed, *parts)).encode()).hexdigest()[:20]
+
+
+class SyntheticSource:
+    """
+    Deterministic Places data. Every place handed out by a search is kept,
+    so a following details call returns the same place; unseen place_ids
+    get a generated place of their own.
+    """
+
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+        self._places: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def _remember(self, place_id: str, payload: dict) -> dict:
+        with self._lock:
+            return self._places.setdefault(place_id, payload)
+
+    def _industry(self, text: str, rng: random.Random) -> str:
+        lowered = text.lower()
+        for primary_type, stems in synthetic.INDUSTRIES:
+            if any(stem.lower() in lowered for stem in stems):
+                return primary_type
+        return rng.choice(synthetic.INDUSTRIES)[0]
+
+    def textsearch(self, params: dict) -> dict:
+        query = " ".join(params.get("query", "").split())
+        rng = _rng_for(self.seed, "textsearch", query.casefold())
+        city = next((c for c in synthetic.CITIES if query.casefold().endswith(c.casefold())), None)
+        name = query[: -len(city)].strip() if city else query
+        if not name:
+            return {"status": "ZERO_RESULTS", "results": []}
+
+        place_id = _place_id(self.seed, "business", name.casefold())
+        payload = synthetic.detail_payload(rng, city, self._industry(name, rng))
+        payload["name"] = name
+        payload = self._remember(place_id, payload)
+        return {"status": "OK", "results": [{
+            "place_id": place_id,
+            "name": payload["name"],
+            "formatted_address": payload["formatted_address"],
+            "geometry": payload["geometry"],
+            "types": payload["types"],
+        }]}
+
+    def details(self, params: dict) -> dict:
+        place_id = params.get("place_id", "")
+        if not place_id:
+            return {"status": "INVALID_REQUEST"}
+        with self._lock:
+            payload = self._places.get(place_id)
+        if payload is None:
+            payload = self._remember(
+                place_id, synthetic.detail_payload(_rng_for(self.seed, "details", place_id)),
+            )
+        return {"status": "OK", "result": payload}
+
+    def nearbysearch(self, params: dict) -> dict:
+        try:
+            lat, lng = (float(v) for v in params.get("location", "").split(","))
+        except ValueError:
+            return {"status": "INVALID_REQUEST"}
+        primary_type = params.get("type") or "establishment"
+        # ~1 km grid, so nearby leads see the same competitors
+        area = (round(lat, 2), round(lng, 2), primary_type)
+        rng = _rng_for(self.seed, "nearbysearch", *area)
+
+        results = []
+        for i in range(NEARBY_RESULTS):
+            place_id = _place_id(self.seed, "nearby", *area, i)
+            # Every fifth place is another industry, for the screening step to drop
+            payload = synthetic.detail_payload(
+                rng, primary_type=None if i % 5 == 4 else primary_type, place_index=i,
+            )
+            if i % 5 != 4:
+                payload["types"] = [primary_type, *synthetic.GENERIC]
+            payload["geometry"] = {"location": {
+                "lat": round(lat + rng.uniform(-0.05, 0.05), 7),
+                "lng": round(lng + rng.uniform(-0.08, 0.08), 7),
+            }}
+            payload = self._remember(place_id, payload)
+            results.append({
+                "place_id": place_id,
+                "name": payload["name"],
+                "types": payload["types"],
+                "rating": payload.get("rating", 0.0),
+                "user_ratings_total": payload["user_ratings_total"],
+                "geometry": payload["geometry"],
+            })
+        return {"status": "OK", "results": results}
+
+
+def _fixture_key(endpoint: str, params: dict) -> str:
+    return json.dumps(
+        [endpoint, {k: v for k, v in sorted(params.items()) if k != "key"}],
+        ensure_ascii=False,
+    )
+
+
+class FixtureSource:
+    """
+    Replays (and, with `record=True`, records) responses kept in a JSON Lines
+    file of {"endpoint", "params", "response"} objects. API keys are never
+    written to the file.
+    """
+
+    def __init__(self, path: str, record: bool = False, upstream: str = GOOGLE_BASE_URL):
+        self.path = path
+        self.record = record
+        self.upstream = upstream
+        self._fixtures: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._fixtures[_fixture_key(entry["endpoint"], entry["params"])] = entry["response"]
+        except FileNotFoundError:
+            if not record:
+                raise
+        logger.info("Loaded %d fixtures from %s", len(self._fixtures), path)
+
+    def fetch(self, endpoint: str, params: dict) -> dict:
+        key = _fixture_key(endpoint, params)
+        with self._lock:
+            response = self._fixtures.get(key)
+        if response is not None:
+            return response
+        if not self.record:
+            logger.warning("No fixture for %s %s", endpoint, params)
+            return _MISSING[endpoint]
+
+        resp = requests.get(
+            f"{self.upstream}/{endpoint}/json",
+            params={**params, "key": os.getenv("GOOGLE_PLACES_API_KEY", "")},
+            timeout=10,
+        )
+        resp.raise_for_status()
+        response = resp.json()
+        stored = {k: v for k, v in params.items() if k != "key"}
+        with self._lock:
+            self._fixtures[key] = response
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(
+                    {"endpoint": endpoint, "params": stored, "response": response},
+                    ensure_ascii=False,
+                ) + "\n")
+        return response
+
+
+# ── App ───────────────────────────────────────────────────────────────────────
+
+def create_app(source, faults: Faults | None = None) -> Flask:
+    """Build the fake server around a SyntheticSource or FixtureSource."""
+    app = Flask(__name__)
+    faults = faults or Faults({})
+    counts = {e: 0 for e in ENDPOINTS}
+    counts_lock = threading.Lock()
+
+    @app.route("/maps/api/place/<endpoint>/json")
+    def places(endpoint: str):
+        if endpoint not in ENDPOINTS:
+            return jsonify(status="INVALID_REQUEST"), 404
+        with counts_lock:
+            counts[endpoint] += 1
+        injected = faults.apply(endpoint)
+        if injected is not None:
+            return injected
+        params = request.args.to_dict()
+        if isinstance(source, FixtureSource):
+            return jsonify(source.fetch(endpoint, params))
+        return jsonify(getattr(source, endpoint)(params))
+
+    @app.route("/stats")
+    def stats():
+        with counts_lock:
+            return jsonify(calls=dict(counts))
+
+    return app
+
+
+def _key_value(value: str) -> tuple[str, str]:
+    key, sep, rest = value.partition("=")
+    return (key, rest) if sep else ("*", value)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--mode", choices=("synthetic", "replay", "record"), default="synthetic")
+    parser.add_argument("--fixtures", default="places_fixtures.jsonl",
+                        help="fixture file for replay/record (default places_fixtures.jsonl)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", action="append", default=[], type=_key_value,
+                        metavar="[ENDPOINT=]SPEC")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-codes", default="500,503")
+    parser.add_argument("--status", action="append", default=[], type=_key_value,
+                        metavar="STATUS=P")
+    args = parser.parse_args()
+    if any(status == "*" for status, _ in args.status):
+        parser.error("--status takes STATUS=P, e.g. OVER_QUERY_LIMIT=0.01")
+
+    logging.basicConfig(level=logging.INFO)
+    faults = Faults(
+        latency=dict(args.latency),
+        error_rate=args.error_rate,
+        error_codes=tuple(int(c) for c in args.error_codes.split(",")),
+        statuses={status: float(p) for status, p in args.status},
+        seed=args.seed,
+    )
+    if args.mode == "synthetic":
+        source = SyntheticSource(args.seed)
+    else:
+        source = FixtureSource(args.fixtures, record=args.mode == "record")
+
+    create_app(source, faults).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
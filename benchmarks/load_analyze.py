@@ -0,0 +1,120 @@
+"""
+Load driver for /analyze: submits leads concurrently, polls each job until it
+finishes and reports throughput and end-to-end latency.
+
+Run the app against benchmarks/fake_places.py so no Places quota is used:
+
+    python -m benchmarks.fake_places --latency lognormal:120,0.5 &
+    PLACES_BASE_URL=http://127.0.0.1:8765/maps/api/place \\
+        gunicorn app:app --bind 127.0.0.1:8000 --workers 2 &
+    python -m benchmarks.load_analyze --url http://127.0.0.1:8000 --leads 200 --concurrency 20
+
+--distinct controls how many different businesses the leads cycle through;
+fewer distinct businesses means more cache and single-flight hits.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks import synthetic
+
+
+def _leads(n: int, distinct: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    businesses = []
+    for i in range(distinct):
+        _, stems = rng.choice(synthetic.INDUSTRIES)
+        name = f"{rng.choice(synthetic.OWNERS)} {rng.choice(stems)} {i}"
+        businesses.append((name, rng.choice(list(synthetic.CITIES))))
+    return [
+        {
+            "first_name": "Last",
+            "email": f"load{i}@example.se",
+            "phone": "",
+            "business_name": businesses[i % distinct][0],
+            "city": businesses[i % distinct][1],
+        }
+        for i in range(n)
+    ]
+
+
+def _run_lead(session: requests.Session, base_url: str, lead: dict, poll: float, timeout: float) -> dict:
+    t0 = time.perf_counter()
+    resp = session.post(
+        f"{base_url}/analyze", data=lead, headers={"Accept": "application/json"}, timeout=30,
+    )
+    if resp.status_code != 202:
+        return {"status": f"http_{resp.status_code}", "seconds": time.perf_counter() - t0}
+    status_url = base_url + resp.json()["status_url"]
+
+    while time.perf_counter() - t0 < timeout:
+        job = session.get(status_url, timeout=30).json()
+        if job["status"] in ("done", "failed"):
+            return {"status": job["status"], "seconds": time.perf_counter() - t0}
+        time.sleep(poll)
+    return {"status": "timeout", "seconds": time.perf_counter() - t0}
+
+
+def _percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * p), len(ordered) - 1)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--leads", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--distinct", type=int, default=50)
+    parser.add_argument("--poll", type=float, default=0.2, help="seconds between status polls")
+    parser.add_argument("--timeout", type=float, default=120, help="per-lead timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write a JSON summary to this file")
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip("/")
+    leads = _leads(args.leads, max(args.distinct, 1), args.seed)
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        outcomes = list(pool.map(
+            lambda lead: _run_lead(session, base_url, lead, args.poll, args.timeout), leads,
+        ))
+    wall = time.perf_counter() - started
+
+    by_status: dict[str, int] = {}
+    for o in outcomes:
+        by_status[o["status"]] = by_status.get(o["status"], 0) + 1
+    done = [o["seconds"] for o in outcomes if o["status"] == "done"]
+    summary = {
+        "leads": args.leads,
+        "concurrency": args.concurrency,
+        "distinct": args.distinct,
+        "wall_s": wall,
+        "throughput_per_s": len(done) / wall if wall else 0.0,
+        "statuses": by_status,
+        "latency_s": {
+            "p50": statistics.median(done),
+            "p90": _percentile(done, 0.90),
+            "p99": _percentile(done, 0.99),
+            "max": max(done),
+        } if done else None,
+    }
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
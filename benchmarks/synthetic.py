@@ -0,0 +1,120 @@
+"""
+Seeded generator of realistic Places data for benchmarks and load tests.
+
+Raw payloads look like the `result` object of a legacy Place Details
+response; profiles are the same payloads run through _normalise_details, so
+they carry exactly the fields the scoring and PDF code read. The same seed
+always produces the same data.
+"""
+
+from __future__ import annotations
+
+import random
+
+from utils.places_api import _normalise_details
+
+CITIES = {
+    "Stockholm": (59.3293, 18.0686),
+    "Göteborg": (57.7089, 11.9746),
+    "Malmö": (55.6050, 13.0038),
+    "Uppsala": (59.8586, 17.6389),
+    "Västerås": (59.6099, 16.5448),
+}
+
+# (primary type, Swedish name stems) — types as the Places API reports them
+INDUSTRIES = [
+    ("plumber", ["VVS", "Rörmokare", "Rör & Värme"]),
+    ("electrician", ["El", "Elservice", "Elinstallation"]),
+    ("restaurant", ["Bistro", "Krog", "Kök & Bar"]),
+    ("hair_care", ["Frisör", "Hårstudio", "Salong"]),
+    ("dentist", ["Tandvård", "Tandläkare", "Tandklinik"]),
+    ("car_repair", ["Bilverkstad", "Motor", "Bilservice"]),
+]
+GENERIC = ["establishment", "point_of_interest"]
+OWNERS = ["Eriks", "Annas", "Lindqvists", "Nordens", "Söders", "Centrala", "Karlssons", "Bästa"]
+STREETS = ["Storgatan", "Kungsgatan", "Drottninggatan", "Hamngatan", "Skolgatan"]
+WEEKDAYS = ["måndag", "tisdag", "onsdag", "torsdag", "fredag", "lördag", "söndag"]
+
+
+def _review_count(rng: random.Random) -> int:
+    # Long tail: most local businesses have a few dozen reviews, chains thousands
+    return min(int(rng.lognormvariate(3.5, 1.3)), 20000)
+
+
+def detail_payload(
+    rng: random.Random,
+    city: str | None = None,
+    primary_type: str | None = None,
+    place_index: int = 0,
+) -> dict:
+    """One raw Place Details `result` object."""
+    city = city or rng.choice(list(CITIES))
+    industry = next((i for i in INDUSTRIES if i[0] == primary_type), None) or rng.choice(INDUSTRIES)
+    lat, lng = CITIES.get(city, CITIES["Stockholm"])
+    reviews_returned = rng.choice([0, 1, 3, 5, 5, 5])
+
+    result = {
+        "name": f"{rng.choice(OWNERS)} {rng.choice(industry[1])} {place_index}",
+        "formatted_address": f"{rng.choice(STREETS)} {rng.randint(1, 120)}, {city}",
+        "geometry": {"location": {
+            "lat": round(lat + rng.uniform(-0.06, 0.06), 7),
+            "lng": round(lng + rng.uniform(-0.1, 0.1), 7),
+        }},
+        "business_status": "OPERATIONAL",
+        "types": [industry[0], *GENERIC],
+        "user_ratings_total": _review_count(rng),
+        "photos": [
+            {"photo_reference": f"ph{place_index}_{i}", "height": 1080, "width": 1920}
+            for i in range(rng.choice([0, 2, 4, 7, 10, 10]))
+        ],
+        "reviews": [
+            {
+                "author_name": f"Kund {i}",
+                "rating": rng.randint(1, 5),
+                "text": "Bra service och snabb hjälp. " * rng.randint(1, 6),
+                "time": 1_700_000_000 + i * 86_400,
+                **({"owner_response": {"text": "Tack!"}} if rng.random() < 0.3 else {}),
+            }
+            for i in range(reviews_returned)
+        ],
+    }
+    if result["user_ratings_total"]:
+        result["rating"] = round(rng.uniform(3.0, 5.0), 1)
+    if rng.random() < 0.8:
+        result["website"] = f"https://example.se/{place_index}"
+    if rng.random() < 0.85:
+        result["formatted_phone_number"] = f"08-{rng.randint(100, 999)} {rng.randint(10, 99)} {rng.randint(10, 99)}"
+    if rng.random() < 0.7:
+        result["opening_hours"] = {"weekday_text": [f"{d}: 08:00–17:00" for d in WEEKDAYS]}
+    if rng.random() < 0.3:
+        result["editorial_summary"] = {"overview": f"{industry[1][0]} i {city}."}
+    return result
+
+
+def detail_payloads(n: int, seed: int = 0) -> list[tuple[str, dict]]:
+    """n (place_id, raw result) pairs."""
+    rng = random.Random(seed)
+    return [(f"synthetic-{seed}-{i}", detail_payload(rng, place_index=i)) for i in range(n)]
+
+
+def profiles(n: int, seed: int = 0) -> list[dict]:
+    """n normalised profiles, as get_place_details would return them."""
+    return [_normalise_details(pid, result) for pid, result in detail_payloads(n, seed)]
+
+
+def reports(n: int, seed: int = 0, competitors_per_report: int = 5) -> list[tuple[dict, list[dict]]]:
+    """n (business, competitors) pairs from the same city and industry."""
+    rng = random.Random(seed)
+    out = []
+    for r in range(n):
+        city = rng.choice(list(CITIES))
+        primary_type = rng.choice(INDUSTRIES)[0]
+        places = [
+            _normalise_details(
+                f"synthetic-{seed}-{r}-{i}",
+                detail_payload(rng, city, primary_type, place_index=i),
+            )
+            for i in range(competitors_per_report + 1)
+        ]
+        out.append((places[0], places[1:]))
+    return out
@@ -11,18 +11,46 @@
   if (!form || !overlay) return;
 
   const steps = ['step-1', 'step-2', 'step-3', 'step-4'];
-  let currentStep = 0;
+  const POLL_INTERVAL = 1000; // ms
+  const MAX_POLL_ERRORS = 5;  // consecutive failed polls before giving up
+
+  // Mark the first `stage` steps as done and the next one as active
+  function showStage(stage) {
+    steps.forEach(function (id, i) {
+      const el = document.getElementById(id);
+      if (!el) return;
+      el.classList.toggle('done', i < stage);
+      el.classList.toggle('active', i === stage);
+    });
+  }
 
-  function advanceStep() {
-    if (currentStep > 0) {
-      const prev = document.getElementById(steps[currentStep - 1]);
-      if (prev) { prev.classList.remove('active'); prev.classList.add('done'); }
-    }
-    if (currentStep < steps.length) {
-      const cur = document.getElementById(steps[currentStep]);
-      if (cur) cur.classList.add('active');
-      currentStep++;
-    }
+  function pollJob(job, errors) {
+    fetch(job.status_url, { headers: { 'Accept': 'application/json' } })
+      .then(function (resp) {
+        if (!resp.ok) throw new Error('status ' + resp.status);
+        return resp.json();
+      })
+      .then(function (status) {
+        showStage(status.stage);
+        if (status.status === 'done' || status.status === 'failed') {
+          // The results page shows the report, or sends us back with the error
+          window.location.href = status.results_url;
+          return;
+        }
+        setTimeout(function () { pollJob(job, 0); }, POLL_INTERVAL);
+      })
+      .catch(function () {
+        if (errors + 1 >= MAX_POLL_ERRORS) {
+          // Unknown job or a broken status endpoint: let the server decide
+          if (job.results_url) {
+            window.location.href = job.results_url;
+          } else {
+            form.submit();
+          }
+          return;
+        }
+        setTimeout(function () { pollJob(job, errors + 1); }, POLL_INTERVAL);
+      });
   }
 
   form.addEventListener('submit', function (e) {
@@ -39,8 +67,8 @@
       }
     });
 
+    e.preventDefault();
     if (!valid) {
-      e.preventDefault();
       const firstInvalid = form.querySelector('[required]:not([value])');
       if (firstInvalid) firstInvalid.focus();
       return;
@@ -49,12 +77,23 @@
     // Show loading overlay
     overlay.classList.remove('hidden');
     if (btn) { btn.disabled = true; btn.querySelector('.btn-text').textContent = 'Analyzing…'; }
-
-    // Animate steps
-    advanceStep(); // step 1 immediately
-    setTimeout(advanceStep, 5000);   // step 2 at 5s
-    setTimeout(advanceStep, 12000);  // step 3 at 12s
-    setTimeout(advanceStep, 20000);  // step 4 at 20s
+    showStage(0);
+
+    // Enqueue the analysis, then follow its progress
+    fetch(form.action, {
+      method: 'POST',
+      body: new FormData(form),
+      headers: { 'Accept': 'application/json' },
+    })
+      .then(function (resp) {
+        if (!resp.ok) throw new Error('enqueue failed');
+        return resp.json();
+      })
+      .then(function (job) { pollJob(job, 0); })
+      .catch(function () {
+        // Fall back to a plain form post, which reports errors via flash messages
+        form.submit();
+      });
   });
 })();
 
@@ -0,0 +1,86 @@
+"""
+Parity between utils.batch_scoring and the scalar scorer it mirrors.
+
+calculate_scores_batch must give exactly what calculate_numeric_score gives
+for the same profile, including the round(x, 1) ties that _round1 patches up.
+"""
+
+import random
+
+import pytest
+
+from utils.batch_scoring import calculate_scores_batch, profiles_to_columns
+from utils.scoring import calculate_numeric_score
+
+SCORE_KEYS = (
+    "total", "rating_score", "reviews_score", "photos_score",
+    "completeness_score", "description_score", "response_score", "grade",
+)
+
+
+def _random_profile(rng: random.Random) -> dict:
+    returned = rng.randint(0, 10)
+    profile = {
+        "rating": rng.choice([
+            0, 0.0, None,
+            rng.uniform(0, 6),
+            round(rng.uniform(1, 5), 1),
+            # Hundredths such as 4.25 put rating / 5 * 35 on a .x5 tie
+            round(rng.uniform(1, 5), 2),
+            rng.randint(100, 500) / 100 + rng.choice([-1e-12, 0, 1e-12]),
+        ]),
+        "review_count": rng.choice([
+            0, 1, 9, 10, 19, 20, 29, 30, 49, 50, 99, 100, 199, 200, rng.randint(0, 5000),
+        ]),
+        "photo_count": rng.randint(0, 15),
+        "has_website": rng.random() < 0.5,
+        "has_phone": rng.random() < 0.5,
+        "has_hours": rng.random() < 0.5,
+        "has_specific_categories": rng.random() < 0.5,
+        "has_description": rng.random() < 0.5,
+        # 0 returned reviews must score 0, not divide by zero
+        "reviews_returned": returned,
+        # e.g. 3 of 8 → 2.25, a tie for round(x, 1)
+        "reviews_responded": rng.randint(0, returned),
+    }
+    # Profiles from older caches or partial payloads lack some fields
+    for field in list(profile):
+        if rng.random() < 0.1:
+            del profile[field]
+    return profile
+
+
+def _tie_profiles() -> list[dict]:
+    profiles = []
+    for hundredths in range(0, 601):
+        profiles.append({"rating": hundredths / 100})
+        profiles.append({"rating": hundredths * 0.01})
+    for returned in range(0, 21):
+        for responded in range(0, returned + 1):
+            profiles.append({"reviews_returned": returned, "reviews_responded": responded})
+    return profiles
+
+
+def _assert_parity(profiles: list[dict]) -> None:
+    batch = calculate_scores_batch(**profiles_to_columns(profiles))
+    for i, profile in enumerate(profiles):
+        # calculate_numeric_score reads missing fields through .get() defaults
+        expected = calculate_numeric_score(
+            {k: v for k, v in profile.items() if v is not None}, [],
+        )
+        for key in SCORE_KEYS:
+            assert batch[key][i].item() == expected[key], (key, profile)
+
+
+def test_parity_on_rounding_ties():
+    _assert_parity(_tie_profiles())
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_parity_on_generated_profiles(seed):
+    rng = random.Random(seed)
+    _assert_parity([_random_profile(rng) for _ in range(5000)])
+
+
+def test_missing_fields_use_scalar_defaults():
+    _assert_parity([{}, {"rating": None}, {"review_count": 12}, {"reviews_returned": 0}])
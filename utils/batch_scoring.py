@@ -0,0 +1,140 @@
+"""
+Vektoriserad batchpoängsättning för omräkning av många profiler på en gång.
+
+Tar kolumnvisa NumPy-arrayer i stället för en dict per profil och räknar alla
+delpoäng, total och betyg med arrayoperationer. Resultaten är identiska med
+scoring.calculate_numeric_score för samma indata (utan konkurrentjämförelse,
+som ändå inte påverkar poängen).
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+# Standardvärden som .get()-fallbackarna i scoring.calculate_numeric_score
+COLUMNS = {
+    "rating": 0.0,
+    "review_count": 0,
+    "photo_count": 0,
+    "has_website": False,
+    "has_phone": False,
+    "has_hours": False,
+    "has_specific_categories": False,
+    "has_description": False,
+    "reviews_responded": 0,
+    "reviews_returned": 0,
+}
+
+
+def profiles_to_columns(profiles: list[dict]) -> dict[str, np.ndarray]:
+    """Build the columnar input for calculate_scores_batch from profile dicts."""
+    columns = {}
+    for name, default in COLUMNS.items():
+        values = [p.get(name, default) for p in profiles]
+        if isinstance(default, bool):
+            columns[name] = np.array([bool(v) for v in values], dtype=bool)
+        elif isinstance(default, float):
+            columns[name] = np.array([v or 0.0 for v in values], dtype=np.float64)
+        else:
+            columns[name] = np.array(values, dtype=np.int64)
+    return columns
+
+
+def _round1(x: np.ndarray) -> np.ndarray:
+    """
+    round(x, 1) with exactly Python's semantics.
+
+    np.round(x, 1) works on x * 10, which can land on (or cross) a .5 boundary
+    that the exact value of x does not. Those few near-ties are redone with
+    Python's correctly rounded round(); everything else is already identical.
+    """
+    scaled = x * 10
+    out = np.round(scaled) / 10
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-9
+    for i in np.flatnonzero(near_tie):
+        out[i] = round(float(x[i]), 1)
+    return out
+
+
+def calculate_scores_batch(
+    rating,
+    review_count,
+    photo_count,
+    has_website,
+    has_phone,
+    has_hours,
+    has_specific_categories,
+    has_description=None,
+    reviews_responded=None,
+    reviews_returned=None,
+) -> dict[str, np.ndarray]:
+    """
+    Poängsätt n profiler på en gång. Alla argument är array-liknande med
+    längd n. Returnerar en dict av arrayer med samma nycklar som
+    calculate_numeric_score: rating_score … response_score, total och grade.
+    """
+    rating       = np.asarray(rating, dtype=np.float64)
+    review_count = np.asarray(review_count, dtype=np.int64)
+    photo_count  = np.asarray(photo_count, dtype=np.int64)
+    n = rating.shape[0]
+    if reviews_responded is None:
+        reviews_responded = np.zeros(n, dtype=np.int64)
+    if reviews_returned is None:
+        reviews_returned = np.zeros(n, dtype=np.int64)
+    reviews_responded = np.asarray(reviews_responded, dtype=np.int64)
+    reviews_returned  = np.asarray(reviews_returned, dtype=np.int64)
+
+    # Stjärnbetyg: 0 om betyg saknas, annars andel av 35 p
+    rating_score = np.where(
+        rating != 0, _round1((np.minimum(rating, 5.0) / 5.0) * 35), 0.0,
+    )
+
+    # Recensioner: absolut trappa, se scoring._reviews_score
+    reviews_score = np.select(
+        [review_count >= t for t in (200, 100, 50, 30, 20, 10, 1)],
+        [30.0, 26.0, 21.0, 17.0, 12.0, 7.0, 3.0],
+        default=0.0,
+    )
+
+    photos_score = _round1(np.minimum(photo_count / 10, 1.0) * 10)
+
+    completeness_score = (
+        np.where(np.asarray(has_website, dtype=bool), 4, 0) +
+        np.where(np.asarray(has_phone, dtype=bool), 4, 0) +
+        np.where(np.asarray(has_hours, dtype=bool), 4, 0) +
+        np.where(np.asarray(has_specific_categories, dtype=bool), 4, 0)
+    ).astype(np.float64)
+
+    # Alla får 4 p (se scoring._description_score); has_description påverkar inte
+    description_score = np.full(n, 4.0)
+
+    returned = reviews_returned != 0
+    ratio = np.divide(
+        reviews_responded, reviews_returned,
+        out=np.zeros(n, dtype=np.float64), where=returned,
+    )
+    response_score = np.where(returned, _round1(ratio * 6), 0.0)
+
+    # Samma summeringsordning som den skalära koden, sedan int()-trunkering
+    total = np.trunc(
+        rating_score + reviews_score + photos_score +
+        completeness_score + description_score + response_score
+    ).astype(np.int64)
+    total = np.minimum(total, 100)
+
+    grade = np.select(
+        [total >= 85, total >= 70, total >= 55, total >= 40],
+        ["A", "B", "C", "D"],
+        default="F",
+    )
+
+    return {
+        "total": total,
+        "rating_score": rating_score,
+        "reviews_score": reviews_score,
+        "photos_score": photos_score,
+        "completeness_score": completeness_score,
+        "description_score": description_score,
+        "response_score": response_score,
+        "grade": grade,
+    }
@@ -0,0 +1,185 @@
+"""
+SQLite-backed key/value cache with TTL expiry and LRU eviction.
+The database lives on local disk, so every gunicorn worker on the host shares it.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from utils import metrics
+from utils.sqlite_tx import connect
+
+logger = logging.getLogger(__name__)
+
+CACHE_DB_PATH = os.getenv(
+    "CACHE_DB_PATH",
+    os.path.join(tempfile.gettempdir(), "visibility_cache.sqlite3"),
+)
+
+CACHE_LOOKUPS = metrics.counter(
+    "visibility_cache_lookups_total", "Cache lookups by cache and result (hit/miss).",
+)
+CACHE_EVICTIONS = metrics.counter(
+    "visibility_cache_evictions_total", "Entries evicted to stay under max_entries.",
+)
+_METRIC_FOR = {
+    "hit": (CACHE_LOOKUPS, {"result": "hit"}),
+    "miss": (CACHE_LOOKUPS, {"result": "miss"}),
+    "eviction": (CACHE_EVICTIONS, {}),
+}
+
+
+class SQLiteCache:
+    """
+    One table in a shared SQLite file. Values are stored as JSON, or as raw
+    bytes when `binary=True`.
+
+    - Entries older than `ttl` seconds are treated as misses and purged.
+    - When the table grows past `max_entries`, the least recently used
+      entries are evicted.
+    - `ttl <= 0` disables the cache entirely.
+
+    Database errors are logged and treated as misses — a broken cache must
+    never break a report.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        max_entries: int,
+        path: str | None = None,
+        binary: bool = False,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path or CACHE_DB_PATH
+        self.binary = binary
+        self._local = threading.local()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def _conn(self) -> sqlite3.Connection:
+        return connect(self._local, self.path, (
+            f"CREATE TABLE IF NOT EXISTS {self.name} ("
+            "  key TEXT PRIMARY KEY,"
+            "  value BLOB NOT NULL,"
+            "  expires_at REAL NOT NULL,"
+            "  last_used REAL NOT NULL"
+            ")",
+            f"CREATE INDEX IF NOT EXISTS {self.name}_last_used ON {self.name} (last_used)",
+        ))
+
+    def _count(self, event: str, n: int = 1) -> None:
+        # Recorded in the shared metrics store, so counts add up across workers
+        name, labels = _METRIC_FOR[event]
+        metrics.inc(name, n, cache=self.name, **labels)
+
+    def _encode(self, value):
+        return bytes(value) if self.binary else json.dumps(value)
+
+    def _decode(self, stored):
+        return bytes(stored) if self.binary else json.loads(stored)
+
+    def record_lookup(self, hit: bool) -> None:
+        """Count one hit or miss for a lookup the caller resolved itself."""
+        self._count("hit" if hit else "miss")
+
+    def get(self, key: str, default=None, record: bool = True):
+        """
+        Return the cached value for `key`, or `default` on a miss.
+        `record=False` leaves the hit/miss metrics alone (see record_lookup).
+        """
+        if not self.enabled:
+            return default
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                f"SELECT value, expires_at FROM {self.name} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    conn.execute(f"DELETE FROM {self.name} WHERE key = ?", (key,))
+                if record:
+                    self._count("miss")
+                return default
+            conn.execute(
+                f"UPDATE {self.name} SET last_used = ? WHERE key = ?", (now, key)
+            )
+        except sqlite3.Error as exc:
+            logger.warning("Cache '%s' read failed: %s", self.name, exc)
+            if record:
+                self._count("miss")
+            return default
+
+        if record:
+            self._count("hit")
+        return self._decode(row[0])
+
+    def get_first(self, keys: list[str], default=None):
+        """
+        Return the value of the first key in `keys` that has a live entry,
+        or `default`. Counts as a single hit or miss.
+        """
+        if not self.enabled or not keys:
+            return default
+        now = time.time()
+        try:
+            conn = self._conn()
+            placeholders = ",".join("?" * len(keys))
+            rows = dict(conn.execute(
+                f"SELECT key, value FROM {self.name} "
+                f"WHERE key IN ({placeholders}) AND expires_at > ?",
+                (*keys, now),
+            ))
+            key = next((k for k in keys if k in rows), None)
+            if key is None:
+                self._count("miss")
+                return default
+            conn.execute(
+                f"UPDATE {self.name} SET last_used = ? WHERE key = ?", (now, key)
+            )
+        except sqlite3.Error as exc:
+            logger.warning("Cache '%s' read failed: %s", self.name, exc)
+            self._count("miss")
+            return default
+
+        self._count("hit")
+        return self._decode(rows[key])
+
+    def set(self, key: str, value) -> None:
+        """Store `value` under `key`, then enforce the TTL and size bounds."""
+        if not self.enabled:
+            return
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.name} (key, value, expires_at, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                (key, self._encode(value), now + self.ttl, now),
+            )
+            conn.execute(f"DELETE FROM {self.name} WHERE expires_at <= ?", (now,))
+            (size,) = conn.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()
+            excess = size - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    f"DELETE FROM {self.name} WHERE key IN ("
+                    f"  SELECT key FROM {self.name} ORDER BY last_used LIMIT ?"
+                    ")",
+                    (excess,),
+                )
+                self._count("eviction", excess)
+        except sqlite3.Error as exc:
+            logger.warning("Cache '%s' write failed: %s", self.name, exc)
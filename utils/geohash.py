@@ -0,0 +1,67 @@
+"""
+Minimal geohash encoding, used to bucket coordinates into cache cells.
+"""
+
+from __future__ import annotations
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def encode(lat: float, lng: float, precision: int = 6) -> str:
+    """Encode a coordinate as a geohash string of `precision` characters."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bits, bit_count, even = 0, 0, True
+
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                bits = (bits << 1) | 1
+                lng_lo = mid
+            else:
+                bits <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_lo = mid
+            else:
+                bits <<= 1
+                lat_hi = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits, bit_count = 0, 0
+
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> tuple[float, float]:
+    """Return (lat_degrees, lng_degrees) spanned by one cell at `precision`."""
+    total_bits = precision * 5
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def cell_and_neighbours(lat: float, lng: float, precision: int = 6) -> list[str]:
+    """
+    Return the cell containing the point first, followed by its eight
+    surrounding cells (fewer at the poles, where cells wrap or clamp).
+    """
+    dlat, dlng = cell_size(precision)
+    cells = [encode(lat, lng, precision)]
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            if dy == 0 and dx == 0:
+                continue
+            nlat = min(max(lat + dy * dlat, -90.0), 90.0)
+            nlng = (lng + dx * dlng + 180.0) % 360.0 - 180.0
+            cell = encode(nlat, nlng, precision)
+            if cell not in cells:
+                cells.append(cell)
+    return cells
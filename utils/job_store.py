@@ -0,0 +1,78 @@
+"""
+Analysis job state shared by every gunicorn worker: token → small status dict.
+
+Kept apart from SQLiteCache on purpose. Status polls hit it once a second per
+client, so reads must not write (no LRU bookkeeping) or count as cache
+lookups, and updates merge fields in SQL instead of rewriting a dict that was
+read first.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from utils.sqlite_tx import RESULTS_DB_PATH, connect
+
+logger = logging.getLogger(__name__)
+
+
+class JobStore:
+    """
+    Jobs expire `ttl` seconds after they were created. Database errors are
+    logged; get() then returns None, like an unknown job.
+    """
+
+    def __init__(self, ttl: float, path: str | None = None):
+        self.ttl = ttl
+        self.path = path or RESULTS_DB_PATH
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        return connect(self._local, self.path, (
+            "CREATE TABLE IF NOT EXISTS job_state ("
+            "  token TEXT PRIMARY KEY,"
+            "  state TEXT NOT NULL,"
+            "  expires_at REAL NOT NULL"
+            ")",
+        ))
+
+    def get(self, token: str) -> dict | None:
+        try:
+            row = self._conn().execute(
+                "SELECT state FROM job_state WHERE token = ? AND expires_at > ?",
+                (token, time.time()),
+            ).fetchone()
+        except sqlite3.Error as exc:
+            logger.warning("Job store read failed: %s", exc)
+            return None
+        return None if row is None else json.loads(row[0])
+
+    def create(self, token: str, state: dict) -> None:
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO job_state (token, state, expires_at) VALUES (?, ?, ?)",
+                (token, json.dumps(state), now + self.ttl),
+            )
+            conn.execute("DELETE FROM job_state WHERE expires_at <= ?", (now,))
+        except sqlite3.Error as exc:
+            logger.warning("Job store write failed: %s", exc)
+
+    def update(self, token: str, **fields) -> None:
+        """Merge `fields` into the stored state in a single statement."""
+        if not fields:
+            return
+        paths = ", ".join("?, json(?)" for _ in fields)
+        params = [p for key, value in fields.items() for p in (f"$.{key}", json.dumps(value))]
+        try:
+            self._conn().execute(
+                f"UPDATE job_state SET state = json_set(state, {paths}) WHERE token = ?",
+                (*params, token),
+            )
+        except sqlite3.Error as exc:
+            logger.warning("Job store write failed: %s", exc)
@@ -0,0 +1,236 @@
+"""
+Cross-worker metrics in Prometheus text format.
+
+Every gunicorn worker writes its observations straight into one WAL-mode
+SQLite file on local disk (upserts, so concurrent writers add up instead of
+overwriting each other). Whichever worker answers /metrics reads the totals
+for all of them.
+
+    REQUESTS = metrics.counter("app_requests_total", "Requests handled.")
+    LATENCY  = metrics.histogram("app_request_seconds", "Request latency.")
+
+    metrics.inc(REQUESTS, status="ok")
+    with metrics.timed(LATENCY, route="/analyze"):
+        ...
+
+Gauges that describe one process (a queue in this worker) are written with a
+pid label and dropped from the output once that process has exited.
+
+Database errors are logged and ignored — metrics must never break a report.
+METRICS_ENABLED=0 turns recording off.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+from utils.sqlite_tx import connect
+
+logger = logging.getLogger(__name__)
+
+METRICS_DB_PATH = os.getenv(
+    "METRICS_DB_PATH",
+    os.path.join(tempfile.gettempdir(), "visibility_metrics.sqlite3"),
+)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+# Seconds; covers cache hits (ms) up to a full analysis near the gunicorn timeout
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# name → (type, help, buckets)
+_definitions: dict[str, tuple[str, str, tuple[float, ...] | None]] = {}
+# Called at scrape time for values that already live elsewhere (e.g. row counts)
+_collectors: list[Callable[[], list[tuple[str, dict, float]]]] = []
+
+_local = threading.local()
+
+
+def counter(name: str, help_text: str) -> str:
+    _definitions[name] = ("counter", help_text, None)
+    return name
+
+
+def histogram(name: str, help_text: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> str:
+    _definitions[name] = ("histogram", help_text, tuple(sorted(buckets)))
+    return name
+
+
+def gauge(name: str, help_text: str) -> str:
+    _definitions[name] = ("gauge", help_text, None)
+    return name
+
+
+def register_collector(fn: Callable[[], list[tuple[str, dict, float]]]) -> None:
+    """`fn()` returns (gauge name, labels, value) samples, read on every scrape."""
+    _collectors.append(fn)
+
+
+def _conn() -> sqlite3.Connection:
+    return connect(_local, METRICS_DB_PATH, (
+        "CREATE TABLE IF NOT EXISTS metric_values ("
+        "  name TEXT NOT NULL,"
+        "  labels TEXT NOT NULL,"
+        "  value REAL NOT NULL,"
+        "  pid INTEGER,"            # set for per-process gauges only
+        "  PRIMARY KEY (name, labels)"
+        ")",
+    ))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: dict) -> str:
+    return ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items()))
+
+
+def _format_le(bound: float) -> str:
+    return "+Inf" if math.isinf(bound) else repr(float(bound))
+
+
+def _write(rows: list[tuple[str, str, float]], op: str = "add", pid: int | None = None) -> None:
+    if not METRICS_ENABLED:
+        return
+    update = "value + excluded.value" if op == "add" else "excluded.value"
+    try:
+        _conn().executemany(
+            "INSERT INTO metric_values (name, labels, value, pid) VALUES (?, ?, ?, ?) "
+            f"ON CONFLICT(name, labels) DO UPDATE SET value = {update}, pid = excluded.pid",
+            [(name, labels, value, pid) for name, labels, value in rows],
+        )
+    except sqlite3.Error as exc:
+        logger.warning("Metrics write failed: %s", exc)
+
+
+def inc(name: str, value: float = 1.0, **labels) -> None:
+    _write([(name, _labels(labels), value)])
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Record one histogram observation (bucket counts are stored non-cumulative)."""
+    buckets = _definitions[name][2] or DEFAULT_BUCKETS
+    le = next((b for b in buckets if value <= b), math.inf)
+    base = _labels(labels)
+    bucket_labels = _labels({**labels, "le": _format_le(le)})
+    _write([
+        (f"{name}_bucket", bucket_labels, 1),
+        (f"{name}_sum", base, value),
+        (f"{name}_count", base, 1),
+    ])
+
+
+def set_gauge(name: str, value: float, per_process: bool = False, **labels) -> None:
+    pid = os.getpid() if per_process else None
+    if per_process:
+        labels = {**labels, "pid": pid}
+    _write([(name, _labels(labels), value)], op="set", pid=pid)
+
+
+@contextmanager
+def timed(name: str, **labels):
+    """Observe the wall time of the block, whether it returns or raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def render() -> str:
+    """All metrics in Prometheus text exposition format (version 0.0.4)."""
+    stored: dict[str, list[tuple[str, float]]] = {}
+    dead = set()
+    try:
+        for name, labels, value, pid in _conn().execute(
+            "SELECT name, labels, value, pid FROM metric_values ORDER BY name, labels"
+        ):
+            if pid is not None and (pid in dead or not _alive(pid)):
+                dead.add(pid)
+                continue
+            stored.setdefault(name, []).append((labels, value))
+        if dead:
+            _conn().executemany(
+                "DELETE FROM metric_values WHERE pid = ?", [(pid,) for pid in dead],
+            )
+    except sqlite3.Error as exc:
+        logger.warning("Metrics read failed: %s", exc)
+
+    for collect in _collectors:
+        try:
+            for name, labels, value in collect():
+                stored.setdefault(name, []).append((_labels(labels), value))
+        except Exception as exc:
+            logger.warning("Metrics collector failed: %s", exc)
+
+    lines = []
+    for name, (kind, help_text, buckets) in sorted(_definitions.items()):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind != "histogram":
+            for labels, value in stored.get(name, []):
+                lines.append(_sample(name, labels, value))
+            continue
+
+        # Buckets are stored per exact bound; Prometheus wants cumulative counts
+        per_series: dict[str, dict[str, float]] = {}
+        for labels, value in stored.get(f"{name}_bucket", []):
+            base, le = _split_le(labels)
+            per_series.setdefault(base, {})[le] = value
+        sums = dict(stored.get(f"{name}_sum", []))
+        counts = dict(stored.get(f"{name}_count", []))
+        for base in sorted(counts):
+            running = 0.0
+            for bound in (*buckets, math.inf):
+                le = _format_le(bound)
+                running += per_series.get(base, {}).get(le, 0.0)
+                labels = f'{base},le="{le}"' if base else f'le="{le}"'
+                lines.append(_sample(f"{name}_bucket", labels, running))
+            lines.append(_sample(f"{name}_sum", base, sums.get(base, 0.0)))
+            lines.append(_sample(f"{name}_count", base, counts[base]))
+    return "\n".join(lines) + "\n"
+
+
+def _split_le(labels: str) -> tuple[str, str]:
+    """Separate the le label from the rest of a stored bucket label string."""
+    parts = labels.split(",")
+    le = next(p for p in parts if p.startswith("le="))
+    return ",".join(p for p in parts if p != le), le[4:-1]
+
+
+def _sample(name: str, labels: str, value: float) -> str:
+    number = int(value) if float(value).is_integer() else value
+    return f"{name}{{{labels}}} {number}" if labels else f"{name} {number}"
+
+
+# ── Shared metrics ────────────────────────────────────────────────────────────
+# Used from more than one module, so they are declared once here
+
+STAGE_SECONDS = histogram(
+    "visibility_stage_seconds",
+    "Wall time of each report stage (find_business, get_place_details, "
+    "get_competitors, calculate_score, generate_pdf_bytes, analysis).",
+)
+
+WEBHOOK_DELIVERIES = counter(
+    "visibility_webhook_deliveries_total",
+    "GHL webhook payloads by result (queued, dropped, sent, retry, failed).",
+)
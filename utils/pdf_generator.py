@@ -7,6 +7,7 @@ from __future__ import annotations
 
 import io
 from datetime import date
+from types import MappingProxyType
 
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
@@ -23,6 +24,8 @@ from reportlab.platypus import (
     TableStyle,
 )
 
+from utils.scoring import score_total
+
 # ── Varumärkesfärger ───────────────────────────────────────────────────────────
 NAVY      = colors.HexColor("#0D1B2A")
 NAVY_LIGHT= colors.HexColor("#1A3050")
@@ -78,7 +81,7 @@ def _status_sv(score: float, max_score: float) -> str:
     return "Svag"
 
 
-def _make_styles() -> dict:
+def _build_styles() -> MappingProxyType:
     styles = {
         "title": ParagraphStyle(
             "title", fontSize=26, leading=32, textColor=WHITE,
@@ -122,7 +125,120 @@ def _make_styles() -> dict:
             fontName="Helvetica", alignment=TA_CENTER,
         ),
     }
-    return styles
+
+    # Härledda stilar för poängtabellen
+    body, table_body = styles["body"], styles["table_body"]
+    styles.update({
+        "bar": ParagraphStyle("bar", parent=table_body, fontName="Courier", fontSize=7),
+        "note": ParagraphStyle("note", parent=table_body, textColor=GREY, fontSize=8),
+        "total_label": ParagraphStyle(
+            "tl", parent=body, textColor=WHITE, fontName="Helvetica-Bold",
+        ),
+        "total_value": ParagraphStyle(
+            "tv", parent=body, textColor=WHITE, fontName="Helvetica-Bold",
+            fontSize=13, alignment=TA_CENTER,
+        ),
+        "total_grade": ParagraphStyle(
+            "tg", parent=body, textColor=WHITE, fontName="Helvetica-Bold",
+            alignment=TA_CENTER,
+        ),
+    })
+    return MappingProxyType(styles)
+
+
+def _build_score_styles() -> MappingProxyType:
+    """En fetstil per statusfärg, för poäng- och statuskolumnerna."""
+    return MappingProxyType({
+        colour: ParagraphStyle(
+            "sp", parent=STYLES["table_body"], textColor=colour, fontName="Helvetica-Bold",
+        )
+        for colour in (GREEN, YELLOW, RED)
+    })
+
+
+def _build_table_styles() -> MappingProxyType:
+    table_styles = {
+        "breakdown": TableStyle([
+            ("BACKGROUND",    (0, 0), (-1, 0), NAVY_LIGHT),
+            ("TEXTCOLOR",     (0, 0), (-1, 0), WHITE),
+            ("FONTNAME",      (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("FONTSIZE",      (0, 0), (-1, 0), 9),
+            ("TOPPADDING",    (0, 0), (-1, 0), 9),
+            ("BOTTOMPADDING", (0, 0), (-1, 0), 9),
+            ("LEFTPADDING",   (0, 0), (-1, -1), 8),
+            ("RIGHTPADDING",  (0, 0), (-1, -1), 8),
+            ("FONTNAME",      (0, 1), (-1, -1), "Helvetica"),
+            ("FONTSIZE",      (0, 1), (-1, -1), 9),
+            ("TOPPADDING",    (0, 1), (-1, -1), 8),
+            ("BOTTOMPADDING", (0, 1), (-1, -1), 8),
+            ("ROWBACKGROUNDS",(0, 1), (-1, -1), [WHITE, LIGHT_BG]),
+            ("GRID",          (0, 0), (-1, -1), 0.5, GREY_LINE),
+            ("VALIGN",        (0, 0), (-1, -1), "MIDDLE"),
+            ("ALIGN",         (1, 0), (3, -1), "CENTER"),
+        ]),
+        "competitors": TableStyle([
+            ("BACKGROUND",     (0, 0), (-1, 0), NAVY_LIGHT),
+            ("TEXTCOLOR",      (0, 0), (-1, 0), WHITE),
+            ("FONTNAME",       (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("FONTSIZE",       (0, 0), (-1, 0), 9),
+            ("BACKGROUND",     (0, 1), (-1, 1), colors.HexColor("#DBEAFE")),
+            ("FONTNAME",       (0, 1), (-1, 1), "Helvetica-Bold"),
+            ("ROWBACKGROUNDS", (0, 2), (-1, -1), [WHITE, LIGHT_BG]),
+            ("GRID",           (0, 0), (-1, -1), 0.5, GREY_LINE),
+            ("FONTSIZE",       (0, 1), (-1, -1), 9),
+            ("TOPPADDING",     (0, 0), (-1, -1), 8),
+            ("BOTTOMPADDING",  (0, 0), (-1, -1), 8),
+            ("LEFTPADDING",    (0, 0), (-1, -1), 8),
+            ("RIGHTPADDING",   (0, 0), (-1, -1), 8),
+            ("VALIGN",         (0, 0), (-1, -1), "MIDDLE"),
+            ("ALIGN",          (1, 0), (-1, -1), "CENTER"),
+        ]),
+        "cover_wrapper": TableStyle([("ALIGN", (0, 0), (-1, -1), "CENTER")]),
+        "cover_info": TableStyle([
+            ("FONTNAME",      (0, 0), (0, -1), "Helvetica-Bold"),
+            ("FONTNAME",      (1, 0), (1, -1), "Helvetica"),
+            ("FONTSIZE",      (0, 0), (-1, -1), 10),
+            ("TEXTCOLOR",     (0, 0), (0, -1), NAVY),
+            ("TEXTCOLOR",     (1, 0), (1, -1), BLACK),
+            ("TOPPADDING",    (0, 0), (-1, -1), 6),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
+            ("LINEBELOW",     (0, 0), (-1, -2), 0.5, GREY_LINE),
+        ]),
+    }
+    return MappingProxyType(table_styles)
+
+
+def _build_grade_table_styles() -> MappingProxyType:
+    """Poängcirkel och totalrad, en variant per betygsfärg."""
+    grade_colours = {_grade_colour(g) for g in ("A", "B", "C", "D", "F", "")}
+    return MappingProxyType({
+        colour: MappingProxyType({
+            "score_cell": TableStyle([
+                ("BACKGROUND", (0, 0), (-1, -1), colour),
+                ("ALIGN",      (0, 0), (-1, -1), "CENTER"),
+                ("VALIGN",     (0, 0), (-1, -1), "MIDDLE"),
+            ]),
+            "total": TableStyle([
+                ("BACKGROUND",    (0, 0), (-1, -1), colour),
+                ("TEXTCOLOR",     (0, 0), (-1, -1), WHITE),
+                ("VALIGN",        (0, 0), (-1, -1), "MIDDLE"),
+                ("TOPPADDING",    (0, 0), (-1, -1), 11),
+                ("BOTTOMPADDING", (0, 0), (-1, -1), 11),
+                ("LEFTPADDING",   (0, 0), (-1, -1), 12),
+                ("ALIGN",         (1, 0), (2, 0), "CENTER"),
+            ]),
+        })
+        for colour in grade_colours
+    })
+
+
+# ── Stilkatalog ───────────────────────────────────────────────────────────────
+# Byggs en gång vid import och delas av alla renderingar; renderingsvägen
+# skapar inga stilobjekt alls. Katalogerna är skrivskyddade (MappingProxyType).
+STYLES             = _build_styles()
+SCORE_STYLES       = _build_score_styles()
+TABLE_STYLES       = _build_table_styles()
+GRADE_TABLE_STYLES = _build_grade_table_styles()
 
 
 # ── Sidhuvud / sidfot ─────────────────────────────────────────────────────────
@@ -169,13 +285,9 @@ def _cover_section(styles, business: dict, scores: dict) -> list:
         colWidths=[5.5 * cm],
         rowHeights=[5.5 * cm],
     )
-    score_cell.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, -1), score_colour),
-        ("ALIGN",      (0, 0), (-1, -1), "CENTER"),
-        ("VALIGN",     (0, 0), (-1, -1), "MIDDLE"),
-    ]))
+    score_cell.setStyle(GRADE_TABLE_STYLES[score_colour]["score_cell"])
     wrapper = Table([[score_cell]], colWidths=[PAGE_W - 2 * MARGIN])
-    wrapper.setStyle(TableStyle([("ALIGN", (0, 0), (-1, -1), "CENTER")]))
+    wrapper.setStyle(TABLE_STYLES["cover_wrapper"])
     elements.append(wrapper)
 
     elements.append(Spacer(1, 0.25 * cm))
@@ -194,16 +306,7 @@ def _cover_section(styles, business: dict, scores: dict) -> list:
         ["Rapport skapad", date.today().strftime("%d %B %Y")],
     ]
     info_table = Table(info_data, colWidths=[4 * cm, PAGE_W - 2 * MARGIN - 4 * cm])
-    info_table.setStyle(TableStyle([
-        ("FONTNAME",      (0, 0), (0, -1), "Helvetica-Bold"),
-        ("FONTNAME",      (1, 0), (1, -1), "Helvetica"),
-        ("FONTSIZE",      (0, 0), (-1, -1), 10),
-        ("TEXTCOLOR",     (0, 0), (0, -1), NAVY),
-        ("TEXTCOLOR",     (1, 0), (1, -1), BLACK),
-        ("TOPPADDING",    (0, 0), (-1, -1), 6),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
-        ("LINEBELOW",     (0, 0), (-1, -2), 0.5, GREY_LINE),
-    ]))
+    info_table.setStyle(TABLE_STYLES["cover_info"])
     elements.append(info_table)
     return elements
 
@@ -238,26 +341,6 @@ def _score_breakdown_section(styles, scores: dict) -> list:
          "Andel av returnerade recensioner med agarsvar"),
     ]
 
-    # Tabellhuvud
-    header_style = TableStyle([
-        ("BACKGROUND",    (0, 0), (-1, 0), NAVY_LIGHT),
-        ("TEXTCOLOR",     (0, 0), (-1, 0), WHITE),
-        ("FONTNAME",      (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("FONTSIZE",      (0, 0), (-1, 0), 9),
-        ("TOPPADDING",    (0, 0), (-1, 0), 9),
-        ("BOTTOMPADDING", (0, 0), (-1, 0), 9),
-        ("LEFTPADDING",   (0, 0), (-1, -1), 8),
-        ("RIGHTPADDING",  (0, 0), (-1, -1), 8),
-        ("FONTNAME",      (0, 1), (-1, -1), "Helvetica"),
-        ("FONTSIZE",      (0, 1), (-1, -1), 9),
-        ("TOPPADDING",    (0, 1), (-1, -1), 8),
-        ("BOTTOMPADDING", (0, 1), (-1, -1), 8),
-        ("ROWBACKGROUNDS",(0, 1), (-1, -1), [WHITE, LIGHT_BG]),
-        ("GRID",          (0, 0), (-1, -1), 0.5, GREY_LINE),
-        ("VALIGN",        (0, 0), (-1, -1), "MIDDLE"),
-        ("ALIGN",         (1, 0), (3, -1), "CENTER"),
-    ])
-
     rows = [[
         Paragraph("Mått", styles["table_header"]),
         Paragraph("Poäng", styles["table_header"]),
@@ -273,31 +356,21 @@ def _score_breakdown_section(styles, scores: dict) -> list:
         bar  = _pct_bar(pts, max_pts, 12)
         stat = _status_sv(pts, max_pts)
 
-        score_para = Paragraph(
-            f"<b>{pts}</b>",
-            ParagraphStyle("sp", parent=styles["table_body"],
-                           textColor=col, fontName="Helvetica-Bold"),
-        )
-        status_para = Paragraph(
-            f"<b>{stat}</b>",
-            ParagraphStyle("st", parent=styles["table_body"],
-                           textColor=col, fontName="Helvetica-Bold"),
-        )
+        score_para  = Paragraph(f"<b>{pts}</b>", SCORE_STYLES[col])
+        status_para = Paragraph(f"<b>{stat}</b>", SCORE_STYLES[col])
 
         rows.append([
             Paragraph(label, styles["table_body_bold"]),
             score_para,
             Paragraph(str(max_pts), styles["table_body"]),
-            Paragraph(bar, ParagraphStyle("bar", parent=styles["table_body"],
-                                          fontName="Courier", fontSize=7)),
+            Paragraph(bar, styles["bar"]),
             status_para,
-            Paragraph(note, ParagraphStyle("note", parent=styles["table_body"],
-                                           textColor=GREY, fontSize=8)),
+            Paragraph(note, styles["note"]),
         ])
 
     col_widths = [4.2 * cm, 1.4 * cm, 1.1 * cm, 3.8 * cm, 1.4 * cm, 5.1 * cm]
     table = Table(rows, colWidths=col_widths, repeatRows=1)
-    table.setStyle(header_style)
+    table.setStyle(TABLE_STYLES["breakdown"])
     elements.append(table)
 
     # Totalrad
@@ -305,35 +378,26 @@ def _score_breakdown_section(styles, scores: dict) -> list:
     elements.append(Spacer(1, 0.4 * cm))
     total_table = Table(
         [[
-            Paragraph("<b>TOTAL SYNLIGHETSPOÄNG</b>",
-                      ParagraphStyle("tl", parent=styles["body"], textColor=WHITE,
-                                     fontName="Helvetica-Bold")),
-            Paragraph(f"<b>{scores['total']} / 100</b>",
-                      ParagraphStyle("tv", parent=styles["body"], textColor=WHITE,
-                                     fontName="Helvetica-Bold", fontSize=13,
-                                     alignment=TA_CENTER)),
-            Paragraph(f"<b>Betyg {scores['grade']}</b>",
-                      ParagraphStyle("tg", parent=styles["body"], textColor=WHITE,
-                                     fontName="Helvetica-Bold", alignment=TA_CENTER)),
+            Paragraph("<b>TOTAL SYNLIGHETSPOÄNG</b>", styles["total_label"]),
+            Paragraph(f"<b>{scores['total']} / 100</b>", styles["total_value"]),
+            Paragraph(f"<b>Betyg {scores['grade']}</b>", styles["total_grade"]),
         ]],
         colWidths=[PAGE_W - 2 * MARGIN - 5 * cm, 3 * cm, 2 * cm],
     )
-    total_table.setStyle(TableStyle([
-        ("BACKGROUND",    (0, 0), (-1, -1), total_colour),
-        ("TEXTCOLOR",     (0, 0), (-1, -1), WHITE),
-        ("VALIGN",        (0, 0), (-1, -1), "MIDDLE"),
-        ("TOPPADDING",    (0, 0), (-1, -1), 11),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 11),
-        ("LEFTPADDING",   (0, 0), (-1, -1), 12),
-        ("ALIGN",         (1, 0), (2, 0), "CENTER"),
-    ]))
+    total_table.setStyle(GRADE_TABLE_STYLES[total_colour]["total"])
     elements.append(total_table)
     return elements
 
 
 # ── Avsnitt 3: Konkurrentjämförelse ──────────────────────────────────────────
 
-def _competitor_section(styles, business: dict, competitors: list[dict], scores: dict) -> list:
+def _competitor_section(
+    styles,
+    business: dict,
+    competitors: list[dict],
+    scores: dict,
+    competitor_scores: list[int] | None = None,
+) -> list:
     elements = [PageBreak()]
     elements.append(Spacer(1, 0.5 * cm))
     elements.append(Paragraph("Lokal Konkurrentjämförelse", styles["section_heading"]))
@@ -345,26 +409,6 @@ def _competitor_section(styles, business: dict, competitors: list[dict], scores:
     ))
     elements.append(Spacer(1, 0.35 * cm))
 
-    from utils.scoring import calculate_score as calc
-
-    ts = TableStyle([
-        ("BACKGROUND",     (0, 0), (-1, 0), NAVY_LIGHT),
-        ("TEXTCOLOR",      (0, 0), (-1, 0), WHITE),
-        ("FONTNAME",       (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("FONTSIZE",       (0, 0), (-1, 0), 9),
-        ("BACKGROUND",     (0, 1), (-1, 1), colors.HexColor("#DBEAFE")),
-        ("FONTNAME",       (0, 1), (-1, 1), "Helvetica-Bold"),
-        ("ROWBACKGROUNDS", (0, 2), (-1, -1), [WHITE, LIGHT_BG]),
-        ("GRID",           (0, 0), (-1, -1), 0.5, GREY_LINE),
-        ("FONTSIZE",       (0, 1), (-1, -1), 9),
-        ("TOPPADDING",     (0, 0), (-1, -1), 8),
-        ("BOTTOMPADDING",  (0, 0), (-1, -1), 8),
-        ("LEFTPADDING",    (0, 0), (-1, -1), 8),
-        ("RIGHTPADDING",   (0, 0), (-1, -1), 8),
-        ("VALIGN",         (0, 0), (-1, -1), "MIDDLE"),
-        ("ALIGN",          (1, 0), (-1, -1), "CENTER"),
-    ])
-
     rows = [[
         Paragraph("Företag",         styles["table_header"]),
         Paragraph("Betyg",           styles["table_header"]),
@@ -386,14 +430,17 @@ def _competitor_section(styles, business: dict, competitors: list[dict], scores:
             Paragraph(f"<b>{score_val}</b>", styles["table_body_bold"]),
         ]
 
+    # Poängen är normalt redan beräknade av anroparen
+    if competitor_scores is None:
+        competitor_scores = [score_total(comp) for comp in competitors]
+
     rows.append(_row(business, scores["total"], is_you=True))
-    for comp in competitors:
-        comp_scores = calc(comp, [])
-        rows.append(_row(comp, comp_scores["total"]))
+    for comp, comp_total in zip(competitors, competitor_scores):
+        rows.append(_row(comp, comp_total))
 
     col_widths = [5 * cm, 2.2 * cm, 2.4 * cm, 1.6 * cm, 2.3 * cm, 3.5 * cm]
     table = Table(rows, colWidths=col_widths, repeatRows=1)
-    table.setStyle(ts)
+    table.setStyle(TABLE_STYLES["competitors"])
     elements.append(table)
     return elements
 
@@ -434,12 +481,18 @@ def _recommendations_section(styles, scores: dict) -> list:
 
 # ── Huvudfunktion ─────────────────────────────────────────────────────────────
 
-def _build_story(first_name: str, business: dict, scores: dict, competitors: list[dict]) -> list:
-    styles = _make_styles()
+def _build_story(
+    first_name: str,
+    business: dict,
+    scores: dict,
+    competitors: list[dict],
+    competitor_scores: list[int] | None = None,
+) -> list:
+    styles = STYLES
     story  = []
     story += _cover_section(styles, business, scores)
     story += _score_breakdown_section(styles, scores)
-    story += _competitor_section(styles, business, competitors, scores)
+    story += _competitor_section(styles, business, competitors, scores, competitor_scores)
     story += _recommendations_section(styles, scores)
     return story
 
@@ -449,10 +502,13 @@ def generate_pdf_bytes(
     business: dict,
     scores: dict,
     competitors: list[dict],
+    competitor_scores: list[int] | None = None,
 ) -> bytes:
     """
     Genererar en PDF-rapport helt i minnet och returnerar råa bytes.
     Inga filskrivningar – fungerar på ephemeral-hosting (Railway, Render, etc.).
+    `competitor_scores` är konkurrenternas totalpoäng i samma ordning som
+    `competitors`; utelämnas de beräknas de här.
     """
     buf = io.BytesIO()
     doc = SimpleDocTemplate(
@@ -466,7 +522,7 @@ def generate_pdf_bytes(
         author="LocalRankPro",
     )
     doc.build(
-        _build_story(first_name, business, scores, competitors),
+        _build_story(first_name, business, scores, competitors, competitor_scores),
         onFirstPage=_header_footer,
         onLaterPages=_header_footer,
     )
@@ -0,0 +1,215 @@
+"""
+Process-pool PDF rendering service.
+
+ReportLab layout is pure Python and CPU-bound, so rendering on a request
+thread holds the GIL and stalls every other thread in the worker. Renders are
+sent to a small pool of worker processes instead, each with ReportLab
+imported up front. Inputs are the plain `business` / `scores` /
+`competitors` dicts; the result is the PDF as bytes.
+
+PDF_RENDER_WORKERS=0 renders in the calling thread (no pool).
+
+Rendered PDFs are also kept in a content-addressed cache: the key is a hash
+of everything the report shows (business, competitors, scores, report date),
+so identical reports share one stored blob and repeat renders are free.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+
+from utils import metrics
+from utils.cache import SQLiteCache
+from utils.scoring import with_recommendations
+
+logger = logging.getLogger(__name__)
+
+RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", "2"))
+RENDER_TIMEOUT = float(os.getenv("PDF_RENDER_TIMEOUT", "30"))
+
+# Keys embed the report date, so entries only need to outlive one day
+_pdf_cache = SQLiteCache(
+    "pdf_blobs",
+    ttl=float(os.getenv("PDF_CACHE_TTL", str(2 * 24 * 3600))),
+    max_entries=int(os.getenv("PDF_CACHE_MAX_ENTRIES", "500")),
+    binary=True,
+)
+
+PDF_RENDERS = metrics.counter(
+    "visibility_pdf_renders_total", "PDF renders by result (ok, timeout, failed).",
+)
+PDF_QUEUE_DEPTH = metrics.gauge(
+    "visibility_pdf_render_queue_depth", "Renders submitted by a worker that have not finished.",
+)
+
+_pool: ProcessPoolExecutor | None = None
+_pool_pid: int | None = None
+_lock = threading.Lock()
+_queue_depth = 0
+
+
+def _warm_worker() -> None:
+    """Pool initializer: pay the ReportLab import once per worker process."""
+    import utils.pdf_generator  # noqa: F401
+
+
+def _render(
+    first_name: str,
+    business: dict,
+    scores: dict,
+    competitors: list[dict],
+    competitor_scores: list[int] | None,
+) -> bytes:
+    from utils.pdf_generator import generate_pdf_bytes
+    # Runs in the pool process; metrics are shared through SQLite, so that's fine
+    with metrics.timed(metrics.STAGE_SECONDS, stage="generate_pdf_bytes"):
+        return generate_pdf_bytes(first_name, business, scores, competitors, competitor_scores)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool, _pool_pid
+    with _lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # spawn, not fork: the parent runs request and executor threads
+            _pool = ProcessPoolExecutor(
+                max_workers=RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_worker,
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _reset_pool() -> None:
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def warm_up() -> None:
+    """Start every pool worker now, so the first download doesn't pay for it."""
+    if RENDER_WORKERS <= 0:
+        return
+    pool = _get_pool()
+    for future in [pool.submit(_warm_worker) for _ in range(RENDER_WORKERS)]:
+        future.result()
+
+
+def render_pdf(
+    first_name: str,
+    business: dict,
+    scores: dict,
+    competitors: list[dict],
+    competitor_scores: list[int] | None = None,
+    timeout: float | None = None,
+) -> bytes:
+    """
+    Render the report PDF in the process pool and return its bytes.
+    Raises concurrent.futures.TimeoutError if it takes longer than `timeout`
+    (default PDF_RENDER_TIMEOUT) seconds.
+    """
+    if RENDER_WORKERS <= 0:
+        pdf_bytes = _render(first_name, business, scores, competitors, competitor_scores)
+        metrics.inc(PDF_RENDERS, result="ok")
+        return pdf_bytes
+
+    _track_queue(+1)
+    try:
+        try:
+            # submit() itself raises BrokenProcessPool once a worker has died
+            future = _get_pool().submit(
+                _render, first_name, business, scores, competitors, competitor_scores,
+            )
+            pdf_bytes = future.result(timeout=timeout if timeout is not None else RENDER_TIMEOUT)
+        except TimeoutError:
+            # A render that already started cannot be interrupted; it finishes
+            # in the background and its result is dropped.
+            future.cancel()
+            metrics.inc(PDF_RENDERS, result="timeout")
+            raise
+        except BrokenProcessPool:
+            logger.error("PDF render pool broke — restarting it")
+            _reset_pool()
+            metrics.inc(PDF_RENDERS, result="failed")
+            raise
+        except Exception:
+            metrics.inc(PDF_RENDERS, result="failed")
+            raise
+    finally:
+        _track_queue(-1)
+
+    metrics.inc(PDF_RENDERS, result="ok")
+    return pdf_bytes
+
+
+def _track_queue(delta: int) -> None:
+    global _queue_depth
+    with _lock:
+        _queue_depth += delta
+        depth = _queue_depth
+    metrics.set_gauge(PDF_QUEUE_DEPTH, depth, per_process=True)
+
+
+def report_key(
+    business: dict,
+    scores: dict,
+    competitors: list[dict],
+    report_date: date | None = None,
+) -> str:
+    """
+    Stable content hash of a report. first_name is deliberately left out —
+    the PDF never shows it.
+    """
+    payload = json.dumps(
+        {
+            "business": business,
+            "competitors": competitors,
+            "scores": scores,
+            "date": (report_date or date.today()).isoformat(),
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=list,  # lazy recommendations hash as their rendered text
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cached_pdf(key: str) -> bytes | None:
+    """Return the stored PDF for a report key, if it is still cached."""
+    return _pdf_cache.get(key)
+
+
+def render_pdf_cached(
+    first_name: str,
+    business: dict,
+    scores: dict,
+    competitors: list[dict],
+    competitor_scores: list[int] | None = None,
+    top_competitor_name: str | None = None,
+) -> tuple[str, bytes]:
+    """
+    Return (report_key, pdf_bytes), rendering only if no identical report
+    has been rendered and cached already.
+
+    `scores` may come straight from calculate_numeric_score; the
+    recommendation texts are then built here, and only when rendering.
+    """
+    key = report_key(business, scores, competitors)
+    pdf_bytes = _pdf_cache.get(key)
+    if pdf_bytes is None:
+        if "recommendations" not in scores:
+            scores = with_recommendations(scores, business, top_competitor_name)
+        pdf_bytes = render_pdf(first_name, business, scores, competitors, competitor_scores)
+        _pdf_cache.set(key, pdf_bytes)
+    return key, pdf_bytes
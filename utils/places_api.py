@@ -3,13 +3,27 @@ Google Places API utilities for the visibility scoring tool.
 Uses the legacy Places API (maps.googleapis.com).
 """
 
+import contextvars
 import os
 import requests
 import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Callable
+
+from requests.adapters import HTTPAdapter
+
+from utils import geohash, metrics, places_usage
+from utils.cache import SQLiteCache
+from utils.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
-BASE_URL = "https://maps.googleapis.com/maps/api/place"
+# Override to point at a stand-in server, e.g. benchmarks/fake_places.py
+BASE_URL = os.getenv("PLACES_BASE_URL", "https://maps.googleapis.com/maps/api/place").rstrip("/")
 
 DETAIL_FIELDS = (
     "name,rating,user_ratings_total,photos,types,"
@@ -24,11 +38,173 @@ GENERIC_TYPES = {
     "health", "finance", "local_government_office"
 }
 
+# Max number of Place Details calls in flight while collecting competitors.
+# 1 restores the old strictly sequential behaviour.
+DETAIL_CONCURRENCY = max(int(os.getenv("PLACES_DETAIL_CONCURRENCY", "5")), 1)
+
+# Threads shared by every analysis in this process for Place Details and
+# parallel Text Search calls. Reusing them keeps their SQLite connections
+# warm, and bounds outbound Places concurrency per process no matter how
+# many analyses run at once.
+PLACES_WORKERS = max(int(os.getenv("PLACES_WORKERS", str(DETAIL_CONCURRENCY * 2))), 1)
+
+# Send all find_business query variants at once and take the highest-priority
+# match. Cuts worst-case lookup latency to one round trip, but every variant
+# that is not already cached is billed as a Text Search call.
+FIND_BUSINESS_PARALLEL = os.getenv("FIND_BUSINESS_PARALLEL", "0") == "1"
+
+# Keep-alive connection pool shared by every Places call in this process.
+# POOL_MAXSIZE is how many idle connections per host are kept for reuse; the
+# default covers the shared Places threads plus the analysis threads. Callers
+# beyond it get a one-off connection rather than waiting for a free one — that
+# wait would not be bounded by PLACES_TIMEOUT or the analysis deadline.
+POOL_CONNECTIONS = int(os.getenv("PLACES_POOL_CONNECTIONS", "2"))
+POOL_MAXSIZE     = int(os.getenv("PLACES_POOL_MAXSIZE", str(max(PLACES_WORKERS + 4, 10))))
+REQUEST_TIMEOUT  = float(os.getenv("PLACES_TIMEOUT", "10"))
+
+# Normalised Place Details profiles, shared by all workers on the host.
+# Competitors recur across many reports, so most detail calls become hits.
+_details_cache = SQLiteCache(
+    "place_details",
+    ttl=float(os.getenv("PLACE_DETAILS_CACHE_TTL", str(24 * 3600))),
+    max_entries=int(os.getenv("PLACE_DETAILS_CACHE_MAX_ENTRIES", "5000")),
+)
+
+# Text Search outcomes keyed by normalised query. Matches and ZERO_RESULTS
+# are cached separately so a "not found" can expire much sooner.
+_textsearch_cache = SQLiteCache(
+    "textsearch",
+    ttl=float(os.getenv("TEXTSEARCH_CACHE_TTL", str(7 * 24 * 3600))),
+    max_entries=int(os.getenv("TEXTSEARCH_CACHE_MAX_ENTRIES", "5000")),
+)
+_textsearch_negative_cache = SQLiteCache(
+    "textsearch_negative",
+    ttl=float(os.getenv("TEXTSEARCH_NEGATIVE_CACHE_TTL", str(3600))),
+    max_entries=int(os.getenv("TEXTSEARCH_CACHE_MAX_ENTRIES", "5000")),
+)
+
+# Nearby Search candidate lists keyed by type, radius and geohash cell.
+# Lookups also accept an entry from any of the eight neighbouring cells, so
+# leads a few hundred metres apart share one competitor search.
+NEARBY_RADIUS = 8000  # metres
+NEARBY_CACHE_PRECISION = int(os.getenv("NEARBY_CACHE_GEOHASH_PRECISION", "6"))
+_nearby_cache = SQLiteCache(
+    "nearbysearch",
+    ttl=float(os.getenv("NEARBY_CACHE_TTL", str(24 * 3600))),
+    max_entries=int(os.getenv("NEARBY_CACHE_MAX_ENTRIES", "2000")),
+)
+
+# End-to-end budget for one build_full_report_data call. Every Places call's
+# timeout is capped by what is left of it, and competitor collection stops
+# (keeping what it has) once it runs out — well inside gunicorn's 120 s kill.
+# 0 disables the deadline.
+ANALYSIS_DEADLINE_SECONDS = float(os.getenv("ANALYSIS_DEADLINE_SECONDS", "45"))
+
+# Monotonic time the current analysis must finish by. Pool threads see it
+# because their work runs in a copy of the submitting context.
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar(
+    "places_deadline", default=None,
+)
+
+# Coalesces concurrent analyses of the same business (double-clicks, shared
+# links) into one Places fetch whose result every caller shares.
+_report_flight = SingleFlight()
+
+PLACES_REQUEST_SECONDS = metrics.histogram(
+    "visibility_places_request_seconds", "Latency of outbound Places API calls by endpoint.",
+)
+PLACES_REQUESTS = metrics.counter(
+    "visibility_places_requests_total",
+    "Outbound Places API calls by endpoint and outcome (Places status, http_<code> or error).",
+)
+PARTIAL_REPORTS = metrics.counter(
+    "visibility_partial_reports_total",
+    "Reports built with fewer competitors because the analysis deadline ran out.",
+)
+
+_session: requests.Session | None = None
+_session_pid: int | None = None
+_session_lock = threading.Lock()
+
+_executor: ThreadPoolExecutor | None = None
+_executor_pid: int | None = None
+_executor_lock = threading.Lock()
+
+
+class DeadlineExceeded(requests.Timeout):
+    """The analysis ran out of time before this Places call could be made."""
+
+
+def _remaining() -> float | None:
+    """Seconds left before the current analysis deadline, or None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
 
 def _api_key():
     return os.getenv("GOOGLE_PLACES_API_KEY", "")
 
 
+def _http_session() -> requests.Session:
+    """Return this process's pooled session, creating it on first use (and after a fork)."""
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=POOL_CONNECTIONS,
+                pool_maxsize=POOL_MAXSIZE,
+                pool_block=False,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session, _session_pid = session, os.getpid()
+        return _session
+
+
+def _places_executor() -> ThreadPoolExecutor:
+    """Return this process's shared Places thread pool (recreated after a fork)."""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=PLACES_WORKERS, thread_name_prefix="places",
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _places_get(endpoint: str, params: dict, timeout: float | None = None) -> dict:
+    """
+    GET a Places web service endpoint (e.g. "details/json") through the
+    pooled session and return the decoded JSON body. The timeout never
+    exceeds what is left of the analysis deadline.
+    Raises requests.RequestException on transport or HTTP errors, and
+    DeadlineExceeded (a requests.Timeout) once the deadline has passed.
+    """
+    name = endpoint.split("/")[0]
+    outcome = "error"
+    start = time.perf_counter()
+    timeout = timeout if timeout is not None else REQUEST_TIMEOUT
+    remaining = _remaining()
+    try:
+        if remaining is not None:
+            if remaining <= 0:
+                outcome = "deadline"
+                raise DeadlineExceeded(f"Analysis deadline passed before {name} call")
+            timeout = min(timeout, remaining)
+        resp = _http_session().get(f"{BASE_URL}/{endpoint}", params=params, timeout=timeout)
+        outcome = f"http_{resp.status_code}"
+        resp.raise_for_status()
+        data = resp.json()
+        outcome = data.get("status", outcome)
+        return data
+    finally:
+        metrics.observe(PLACES_REQUEST_SECONDS, time.perf_counter() - start, endpoint=name)
+        metrics.inc(PLACES_REQUESTS, endpoint=name, status=outcome)
+        places_usage.record_call(endpoint, params, outcome)
+
+
 def _same_industry(business_types: list, competitor_types: list) -> bool:
     """Return True if two businesses share at least one specific (non-generic) type."""
     biz_specific  = {t for t in business_types  if t not in GENERIC_TYPES}
@@ -36,13 +212,30 @@ def _same_industry(business_types: list, competitor_types: list) -> bool:
     return bool(biz_specific & comp_specific)
 
 
+def _normalise_query(query: str) -> str:
+    """
+    Cache key for a Text Search query: case-folded and single-spaced. Legal
+    suffixes are kept — "Bygg AB Stockholm" and "Bygg Stockholm" can get
+    different answers, and find_business relies on trying both.
+    """
+    return " ".join(query.casefold().split())
+
+
 def _textsearch(query: str) -> dict | None:
     """Run a single Text Search query and return the first result, or None."""
+    cache_key = _normalise_query(query)
+    # One lookup across both caches, counted once under "textsearch"
+    cached = _textsearch_cache.get(cache_key, record=False)
+    not_found = cached is None and _textsearch_negative_cache.get(cache_key, record=False)
+    _textsearch_cache.record_lookup(hit=cached is not None or bool(not_found))
+    if cached is not None:
+        return cached
+    if not_found:
+        return None
+
     params = {"query": query, "key": _api_key()}
     try:
-        resp = requests.get(f"{BASE_URL}/textsearch/json", params=params, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
+        data = _places_get("textsearch/json", params)
     except requests.RequestException as exc:
         logger.error("Text Search request failed: %s", exc)
         raise
@@ -53,16 +246,19 @@ def _textsearch(query: str) -> dict | None:
 
     results = data.get("results", [])
     if not results:
+        _textsearch_negative_cache.set(cache_key, True)
         return None
 
     top = results[0]
-    return {
+    match = {
         "place_id": top["place_id"],
         "name": top.get("name", ""),
         "formatted_address": top.get("formatted_address", ""),
         "location": top.get("geometry", {}).get("location", {}),
         "types": top.get("types", []),
     }
+    _textsearch_cache.set(cache_key, match)
+    return match
 
 
 def _simplify_name(name: str) -> str:
@@ -108,9 +304,14 @@ def find_business(business_name: str, city: str) -> dict | None:
             seen.add(q)
             unique.append(q)
 
-    for query in unique:
+    if FIND_BUSINESS_PARALLEL and len(unique) > 1:
+        results = _textsearch_parallel(unique)
+    else:
+        results = ((query, lambda q=query: _textsearch(q)) for query in unique)
+
+    for query, fetch in results:
         logger.info("Trying Places search: %s", query)
-        result = _textsearch(query)
+        result = fetch()
         if result and _names_match(business_name, result["name"]):
             logger.info("Matched: %s", result["name"])
             return result
@@ -120,20 +321,46 @@ def find_business(business_name: str, city: str) -> dict | None:
     return None
 
 
-def get_place_details(place_id: str) -> dict:
+def _textsearch_parallel(queries: list[str]):
+    """
+    Dispatch every query at once and yield (query, fetch) pairs in priority
+    order, where fetch() waits for that query's result. Once the caller stops
+    iterating (a match was accepted), the slower queries are abandoned.
+    """
+    executor = _places_executor()
+    # Each call runs in a copy of our context so its usage is counted here
+    futures = [
+        (q, executor.submit(contextvars.copy_context().run, _textsearch, q))
+        for q in queries
+    ]
+    try:
+        for query, future in futures:
+            yield query, future.result
+    finally:
+        for _, future in futures:
+            future.cancel()
+
+
+def get_place_details(place_id: str, fresh: bool = False) -> dict:
     """
     Fetch full details for a place, including rating, reviews, photos, etc.
     Returns a normalised business profile dict.
+
+    Profiles are served from the details cache when possible; `fresh=True`
+    skips the cache lookup but still refreshes the cached entry.
     """
+    if not fresh:
+        cached = _details_cache.get(place_id)
+        if cached is not None:
+            return cached
+
     params = {
         "place_id": place_id,
         "fields": DETAIL_FIELDS,
         "key": _api_key(),
     }
     try:
-        resp = requests.get(f"{BASE_URL}/details/json", params=params, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
+        data = _places_get("details/json", params)
     except requests.RequestException as exc:
         logger.error("Place Details request failed: %s", exc)
         raise
@@ -143,7 +370,9 @@ def get_place_details(place_id: str) -> dict:
         raise ValueError(f"Place Details error: {data.get('status')}")
 
     result = data.get("result", {})
-    return _normalise_details(place_id, result)
+    profile = _normalise_details(place_id, result)
+    _details_cache.set(place_id, profile)
+    return profile
 
 
 def _normalise_details(place_id: str, result: dict) -> dict:
@@ -200,11 +429,16 @@ def get_competitors(
     business_types: list,
     exclude_place_id: str,
     limit: int = 5,
+    own_review_count: int | None = None,
 ) -> list[dict]:
     """
     Find nearby competitors of the same type.
     Returns a list of normalised profile dicts (up to `limit`).
 
+    When `own_review_count` is given, candidates are screened on the Nearby
+    Search payload first (industry match + chain cap), so Place Details is
+    only fetched for the survivors.
+
     If the business only has generic types (e.g. point_of_interest), nearby
     search would return random prominent places (hotels, restaurants, etc.).
     In that case we bail out early and return an empty list.
@@ -220,31 +454,139 @@ def get_competitors(
         )
         return []
 
+    nearby = _nearby_search(location, primary_type)
+    if nearby is None:
+        return []
+
+    places = [
+        place for place in nearby
+        if place.get("place_id") and place["place_id"] != exclude_place_id
+    ]
+    if own_review_count is not None:
+        places = _screen_candidates(places, business_types, own_review_count)
+
+    candidate_ids = [place["place_id"] for place in places]
+    return _fetch_competitor_details(candidate_ids, business_types, limit)
+
+
+def _nearby_cache_key(cell: str, primary_type: str) -> str:
+    return f"{primary_type}:{NEARBY_RADIUS}:{cell}"
+
+
+def _nearby_search(location: dict, primary_type: str) -> list[dict] | None:
+    """
+    Run (or reuse) a Nearby Search around `location` for `primary_type`.
+    Returns the raw result list, or None if the search failed.
+    """
+    cells = geohash.cell_and_neighbours(
+        location["lat"], location["lng"], NEARBY_CACHE_PRECISION,
+    )
+    cached = _nearby_cache.get_first(
+        [_nearby_cache_key(cell, primary_type) for cell in cells]
+    )
+    if cached is not None:
+        return cached
+
     params = {
         "location": f"{location['lat']},{location['lng']}",
-        "radius": 8000,           # 8 km radius
+        "radius": NEARBY_RADIUS,
         "type": primary_type,
         "key": _api_key(),
     }
     try:
-        resp = requests.get(f"{BASE_URL}/nearbysearch/json", params=params, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
+        data = _places_get("nearbysearch/json", params)
     except requests.RequestException as exc:
         logger.error("Nearby Search request failed: %s", exc)
-        return []
+        return None
 
     if data.get("status") not in ("OK", "ZERO_RESULTS"):
         logger.warning("Nearby Search status: %s", data.get("status"))
-        return []
+        return None
 
-    competitors = []
-    for place in data.get("results", []):
-        pid = place.get("place_id")
-        if not pid or pid == exclude_place_id:
+    # Only keep what screening needs, so cache entries stay small
+    results = [
+        {
+            "place_id": place.get("place_id"),
+            "name": place.get("name", ""),
+            "types": place.get("types", []),
+            "rating": place.get("rating", 0.0),
+            "user_ratings_total": place.get("user_ratings_total", 0),
+        }
+        for place in data.get("results", [])
+    ]
+    _nearby_cache.set(_nearby_cache_key(cells[0], primary_type), results)
+    return results
+
+
+def _screen_candidates(
+    places: list[dict],
+    business_types: list,
+    own_review_count: int,
+) -> list[dict]:
+    """
+    Apply the industry match and the chain cap to raw Nearby Search results,
+    which already carry `types` and `user_ratings_total`.
+    Returns the surviving places in the order they should be fetched.
+    """
+    same_industry = []
+    for place in places:
+        if not _same_industry(business_types, place.get("types", [])):
+            logger.info(
+                "Screened out '%s' — different industry (types: %s)",
+                place.get("name"), place.get("types"),
+            )
             continue
-        try:
-            profile = get_place_details(pid)
+        same_industry.append({
+            **place,
+            "review_count": place.get("user_ratings_total", 0),
+        })
+
+    return _filter_local_competitors(
+        same_industry,
+        own_review_count=own_review_count,
+        want=len(same_industry),
+    )
+
+
+def _fetch_competitor_details(
+    candidate_ids: list[str],
+    business_types: list,
+    limit: int,
+) -> list[dict]:
+    """
+    Fetch Place Details for candidates with up to DETAIL_CONCURRENCY calls
+    in flight. Results are consumed in ranking order, and no new calls are
+    scheduled once `limit` same-industry profiles have been collected.
+    """
+    competitors = []
+    pending_ids = deque(candidate_ids)
+    in_flight = deque()
+
+    executor = _places_executor()
+    try:
+        while pending_ids or in_flight:
+            # Never keep more calls in flight than profiles still needed
+            window = min(DETAIL_CONCURRENCY, limit - len(competitors))
+            while pending_ids and len(in_flight) < window:
+                pid = pending_ids.popleft()
+                in_flight.append((pid, executor.submit(
+                    contextvars.copy_context().run, get_place_details, pid,
+                )))
+
+            pid, future = in_flight.popleft()
+            remaining = _remaining()
+            try:
+                profile = future.result(timeout=None if remaining is None else max(remaining, 0))
+            except FutureTimeout:
+                logger.warning(
+                    "Analysis deadline reached — continuing with %d of %d competitors",
+                    len(competitors), limit,
+                )
+                break
+            except Exception as exc:
+                logger.warning("Skipping competitor %s: %s", pid, exc)
+                continue
+
             # Reject businesses from a completely different industry
             if not _same_industry(business_types, profile["types"]):
                 logger.info(
@@ -252,50 +594,126 @@ def get_competitors(
                     profile["name"], profile["types"],
                 )
                 continue
-            competitors.append(profile)
-        except Exception as exc:
-            logger.warning("Skipping competitor %s: %s", pid, exc)
-            continue
 
-        if len(competitors) >= limit:
-            break
+            competitors.append(profile)
+            if len(competitors) >= limit:
+                break
+    finally:
+        # Queued calls are dropped; running ones finish in the background
+        for _, future in in_flight:
+            future.cancel()
 
     return competitors
 
 
-def build_full_report_data(business_name: str, city: str) -> dict:
+def build_full_report_data(
+    business_name: str,
+    city: str,
+    on_business_found: Callable[[], None] | None = None,
+    deadline_seconds: float | None = None,
+) -> dict:
     """
     Top-level helper: find business, get details, get competitors.
-    Returns { business: profile, competitors: [profile, ...] }
+    Returns { business: profile, competitors: [profile, ...], competitors_partial: bool }
     or raises ValueError if the business cannot be found.
+
+    `on_business_found` is called once the business has been resolved,
+    before competitors are fetched (used for progress reporting).
+
+    The whole call is bounded by `deadline_seconds` (default
+    ANALYSIS_DEADLINE_SECONDS). If it runs out while competitors are being
+    fetched, the report goes ahead with the ones collected so far and
+    `competitors_partial` is True.
+
+    Concurrent calls for the same normalised business/city pair, or that
+    resolve to the same place_id, share a single fetch. The returned dict
+    may be shared between callers and must not be mutated.
     """
-    search_result = find_business(business_name, city)
+    budget = ANALYSIS_DEADLINE_SECONDS if deadline_seconds is None else deadline_seconds
+    token = None
+    if budget > 0:
+        deadline = time.monotonic() + budget
+        outer = _deadline.get()
+        token = _deadline.set(deadline if outer is None else min(deadline, outer))
+    notified = False
+
+    def business_found() -> None:
+        nonlocal notified
+        notified = True
+        if on_business_found is not None:
+            on_business_found()
+
+    try:
+        query_key = ("query", _normalise_query(business_name), _normalise_query(city))
+        report = _report_flight.do(
+            query_key, _build_full_report_data, business_name, city, business_found,
+        )
+        # Joined another caller's fetch, which only ran that caller's callback
+        if not notified and on_business_found is not None:
+            on_business_found()
+        return report
+    finally:
+        if token is not None:
+            _deadline.reset(token)
+
+
+def _build_full_report_data(
+    business_name: str,
+    city: str,
+    on_business_found: Callable[[], None] | None,
+) -> dict:
+    with metrics.timed(metrics.STAGE_SECONDS, stage="find_business"):
+        search_result = find_business(business_name, city)
     if search_result is None:
         raise ValueError(
             f"Vi kunde inte hitta '{business_name}' på Google Maps. "
             "Kontrollera att företagsnamnet stämmer exakt och att staden är korrekt, och försök igen."
         )
 
-    business_profile = get_place_details(search_result["place_id"])
-
-    # Fetch more candidates than needed so we can filter out large chains
-    raw_competitors = get_competitors(
-        location=business_profile["location"],
-        primary_type=business_profile["primary_type"],
-        business_types=business_profile["types"],
-        exclude_place_id=business_profile["place_id"],
-        limit=10,
+    place_key = ("place", search_result["place_id"])
+    return _report_flight.do(
+        place_key, _report_for_place, search_result["place_id"], on_business_found,
     )
 
+
+def _report_for_place(place_id: str, on_business_found: Callable[[], None] | None) -> dict:
+    # The lead's own profile is always fetched live — they may have just edited it
+    with metrics.timed(metrics.STAGE_SECONDS, stage="get_place_details"):
+        business_profile = get_place_details(place_id, fresh=True)
+    if on_business_found is not None:
+        on_business_found()
+
+    # Candidates are screened on the search payload, so only ~5 need details
+    with metrics.timed(metrics.STAGE_SECONDS, stage="get_competitors"):
+        raw_competitors = get_competitors(
+            location=business_profile["location"],
+            primary_type=business_profile["primary_type"],
+            business_types=business_profile["types"],
+            exclude_place_id=business_profile["place_id"],
+            limit=5,
+            own_review_count=business_profile["review_count"],
+        )
+
     competitors = _filter_local_competitors(
         raw_competitors,
         own_review_count=business_profile["review_count"],
         want=5,
     )
 
+    # Short of competitors and out of time: collection stopped early
+    remaining = _remaining()
+    partial = remaining is not None and remaining <= 0 and len(raw_competitors) < 5
+    if partial:
+        logger.warning(
+            "Report for %s built with %d competitors after the deadline",
+            place_id, len(competitors),
+        )
+        metrics.inc(PARTIAL_REPORTS)
+
     return {
         "business": business_profile,
         "competitors": competitors,
+        "competitors_partial": partial,
     }
 
 
@@ -0,0 +1,172 @@
+"""
+Places API call accounting per billing SKU.
+
+Each billable call made by places_api is attributed to:
+  - the ledger of the analysis that made it (a context variable, so calls
+    made on helper threads count too when the context is carried over), and
+  - a per-day aggregate in SQLite, shared by every worker on the host.
+
+Prices are legacy Places list prices in USD per 1 000 calls and can be
+overridden with PLACES_PRICE_<SKU> (e.g. PLACES_PRICE_TEXT_SEARCH=32).
+Volume discounts and the monthly credit are not applied — the estimate is
+meant for comparing reports and changes, not for reconciling invoices.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, timedelta
+from typing import Iterator
+
+from utils import metrics
+from utils.sqlite_tx import RESULTS_DB_PATH, connect
+
+logger = logging.getLogger(__name__)
+
+SKU_PRICES_PER_1000 = {
+    sku: float(os.getenv(f"PLACES_PRICE_{sku.upper()}", default))
+    for sku, default in (
+        ("text_search", "32"),
+        ("nearby_search", "32"),
+        ("place_details", "17"),
+        ("contact_data", "3"),
+        ("atmosphere_data", "5"),
+    )
+}
+
+# Place Details fields that add the Contact / Atmosphere Data SKUs on top
+# of the base Place Details charge
+CONTACT_FIELDS = {
+    "formatted_phone_number", "international_phone_number", "website",
+    "opening_hours", "current_opening_hours", "secondary_opening_hours",
+}
+ATMOSPHERE_FIELDS = {
+    "rating", "reviews", "user_ratings_total", "editorial_summary", "price_level",
+    "curbside_pickup", "delivery", "dine_in", "reservable", "takeout",
+    "serves_beer", "serves_breakfast", "serves_brunch", "serves_dinner",
+    "serves_lunch", "serves_vegetarian_food", "serves_wine",
+    "wheelchair_accessible_entrance",
+}
+
+# Only these responses are billed; quota and request errors are free
+BILLABLE_STATUSES = {"OK", "ZERO_RESULTS"}
+
+PLACES_BILLED_CALLS = metrics.counter(
+    "visibility_places_billed_calls_total", "Billable Places API calls by SKU.",
+)
+
+USAGE_DB_PATH = os.getenv("PLACES_USAGE_DB_PATH", RESULTS_DB_PATH)
+
+_local = threading.local()
+
+
+def skus_for(endpoint: str, params: dict) -> list[str]:
+    """The SKUs one call to `endpoint` ("details/json" …) with `params` is billed under."""
+    name = endpoint.split("/")[0]
+    if name == "textsearch":
+        return ["text_search"]
+    if name == "nearbysearch":
+        return ["nearby_search"]
+    if name == "details":
+        fields = params.get("fields")
+        # No field mask means every field — and every SKU
+        requested = set(fields.split(",")) if fields else CONTACT_FIELDS | ATMOSPHERE_FIELDS
+        skus = ["place_details"]
+        if requested & CONTACT_FIELDS:
+            skus.append("contact_data")
+        if requested & ATMOSPHERE_FIELDS:
+            skus.append("atmosphere_data")
+        return skus
+    return []
+
+
+def estimate_cost(calls: dict[str, int]) -> float:
+    """USD list price of `calls` (SKU → count)."""
+    return round(sum(SKU_PRICES_PER_1000.get(sku, 0.0) * n for sku, n in calls.items()) / 1000, 4)
+
+
+class UsageLedger:
+    """Thread-safe SKU → call count tally for one analysis."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[str, int] = {}
+
+    def add(self, skus: list[str]) -> None:
+        with self._lock:
+            for sku in skus:
+                self._calls[sku] = self._calls.get(sku, 0) + 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            calls = dict(self._calls)
+        return {"calls": calls, "estimated_cost_usd": estimate_cost(calls)}
+
+
+_ledger: ContextVar[UsageLedger | None] = ContextVar("places_usage_ledger", default=None)
+
+
+@contextmanager
+def track_usage() -> Iterator[UsageLedger]:
+    """
+    Count Places calls made inside the block. Work handed to other threads
+    is only counted if it runs in a copy of this context
+    (contextvars.copy_context().run).
+    """
+    ledger = UsageLedger()
+    token = _ledger.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _ledger.reset(token)
+
+
+def _conn() -> sqlite3.Connection:
+    return connect(_local, USAGE_DB_PATH, (
+        "CREATE TABLE IF NOT EXISTS places_usage_daily ("
+        "  day TEXT NOT NULL,"
+        "  sku TEXT NOT NULL,"
+        "  calls INTEGER NOT NULL,"
+        "  PRIMARY KEY (day, sku)"
+        ")",
+    ))
+
+
+def record_call(endpoint: str, params: dict, status: str) -> None:
+    """Account for one completed Places call (no-op unless it is billable)."""
+    if status not in BILLABLE_STATUSES:
+        return
+    skus = skus_for(endpoint, params)
+    ledger = _ledger.get()
+    if ledger is not None:
+        ledger.add(skus)
+    for sku in skus:
+        metrics.inc(PLACES_BILLED_CALLS, sku=sku)
+    try:
+        _conn().executemany(
+            "INSERT INTO places_usage_daily (day, sku, calls) VALUES (?, ?, 1) "
+            "ON CONFLICT(day, sku) DO UPDATE SET calls = calls + 1",
+            [(date.today().isoformat(), sku) for sku in skus],
+        )
+    except sqlite3.Error as exc:
+        logger.warning("Places usage write failed: %s", exc)
+
+
+def daily_usage(days: int = 30) -> list[dict]:
+    """Per-day call counts and estimated cost for the last `days` days, newest first."""
+    since = (date.today() - timedelta(days=days - 1)).isoformat()
+    per_day: dict[str, dict[str, int]] = {}
+    for day, sku, calls in _conn().execute(
+        "SELECT day, sku, calls FROM places_usage_daily WHERE day >= ? ORDER BY day DESC",
+        (since,),
+    ):
+        per_day.setdefault(day, {})[sku] = calls
+    return [
+        {"day": day, "calls": calls, "estimated_cost_usd": estimate_cost(calls)}
+        for day, calls in per_day.items()
+    ]
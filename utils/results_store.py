@@ -0,0 +1,271 @@
+"""
+Bounded stores for finished reports: token → result dict.
+Entries expire after a TTL and are evicted least-recently-used first when
+either the entry count or the total byte budget is exceeded.
+
+Two interchangeable backends:
+  - ResultsStore         in-process memory (tokens only resolve on one worker)
+  - SQLiteResultsStore   a WAL-mode SQLite file on local disk, shared by every
+                         gunicorn worker on the host
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from utils.sqlite_tx import RESULTS_DB_PATH, connect, transaction
+
+logger = logging.getLogger(__name__)
+
+
+def _entry_size(data: dict) -> int:
+    """Approximate footprint of a result: PDF bytes plus its JSON-encoded fields."""
+    pdf_bytes = data.get("pdf_bytes") or b""
+    rest = {k: v for k, v in data.items() if k != "pdf_bytes"}
+    # default=list materialises lazy sequences such as scores["recommendations"]
+    return len(pdf_bytes) + len(json.dumps(rest, default=list))
+
+
+class ResultsStore:
+    """
+    Thread-safe token → result store with:
+      - max_entries   upper bound on stored results
+      - max_bytes     upper bound on the summed entry sizes (PDFs included)
+      - ttl           seconds after the last write before an entry expires
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # token → (expires_at, size, data), oldest use first
+        self._entries: OrderedDict[str, tuple[float, int, dict]] = OrderedDict()
+        self._bytes = 0
+        self._evictions = {"expired": 0, "max_entries": 0, "max_bytes": 0}
+
+    def get(self, token: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                self._drop(token, "expired")
+                return None
+            self._entries.move_to_end(token)
+            return entry[2]
+
+    def put(self, token: str, data: dict) -> None:
+        with self._lock:
+            self._store(token, data)
+
+    def update(self, token: str, **fields) -> bool:
+        """Merge `fields` into an existing entry. Returns False if it is gone."""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] <= time.time():
+                return False
+            self._store(token, {**entry[2], **fields})
+            return True
+
+    def _store(self, token: str, data: dict) -> None:
+        size = _entry_size(data)
+        if token in self._entries:
+            self._drop(token, None)
+        self._entries[token] = (time.time() + self.ttl, size, data)
+        self._bytes += size
+        self._evict()
+
+    def _drop(self, token: str, reason: str | None) -> None:
+        _, size, _ = self._entries.pop(token)
+        self._bytes -= size
+        if reason:
+            self._evictions[reason] += 1
+
+    def _evict(self) -> None:
+        now = time.time()
+        for token in [t for t, (expires_at, _, _) in self._entries.items() if expires_at <= now]:
+            self._drop(token, "expired")
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)), "max_entries")
+        # Always keep the newest entry, even if it alone exceeds the budget
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._drop(next(iter(self._entries)), "max_bytes")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "evictions": dict(self._evictions),
+            }
+
+
+_RESULTS_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS results ("
+    "  token TEXT PRIMARY KEY,"
+    "  data TEXT NOT NULL,"
+    "  pdf BLOB,"
+    "  size INTEGER NOT NULL,"
+    "  expires_at REAL NOT NULL,"
+    "  last_used REAL NOT NULL"
+    ")",
+    "CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)",
+    "CREATE TABLE IF NOT EXISTS results_evictions ("
+    "  reason TEXT PRIMARY KEY,"
+    "  count INTEGER NOT NULL"
+    ")",
+)
+
+
+class SQLiteResultsStore:
+    """
+    Same interface and limits as ResultsStore, backed by SQLite so a token
+    created on one worker resolves on any other. The PDF is kept in its own
+    BLOB column; the remaining fields are stored as JSON. Eviction counters
+    live in the database too, so stats() covers all workers.
+
+    Database errors are logged: reads return None and writes are dropped,
+    like the caches.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float, path: str | None = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.path = path or RESULTS_DB_PATH
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        return connect(self._local, self.path, _RESULTS_SCHEMA, timeout=10)
+
+    def get(self, token: str) -> dict | None:
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT data, pdf, expires_at FROM results WHERE token = ?", (token,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[2] <= time.time():
+                conn.execute("DELETE FROM results WHERE token = ?", (token,))
+                self._count_evictions(conn, "expired", 1)
+                return None
+            conn.execute(
+                "UPDATE results SET last_used = ? WHERE token = ?", (time.time(), token)
+            )
+        except sqlite3.Error as exc:
+            logger.warning("Results store read failed: %s", exc)
+            return None
+        data = json.loads(row[0])
+        data["pdf_bytes"] = row[1]
+        return data
+
+    def put(self, token: str, data: dict) -> None:
+        try:
+            conn = self._conn()
+            with transaction(conn):
+                self._store(conn, token, data)
+        except sqlite3.Error as exc:
+            logger.warning("Results store write failed: %s", exc)
+
+    def update(self, token: str, **fields) -> bool:
+        """Merge `fields` into an existing entry. Returns False if it is gone."""
+        try:
+            conn = self._conn()
+            with transaction(conn):
+                row = conn.execute(
+                    "SELECT data, pdf FROM results WHERE token = ? AND expires_at > ?",
+                    (token, time.time()),
+                ).fetchone()
+                if row is None:
+                    return False
+                data = {**json.loads(row[0]), "pdf_bytes": row[1], **fields}
+                self._store(conn, token, data)
+                return True
+        except sqlite3.Error as exc:
+            logger.warning("Results store write failed: %s", exc)
+            return False
+
+    def _store(self, conn: sqlite3.Connection, token: str, data: dict) -> None:
+        pdf_bytes = data.get("pdf_bytes")
+        rest = {k: v for k, v in data.items() if k != "pdf_bytes"}
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO results (token, data, pdf, size, expires_at, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (token, json.dumps(rest, default=list), pdf_bytes, _entry_size(data), now + self.ttl, now),
+        )
+        self._evict(conn, keep=token)
+
+    def _evict(self, conn: sqlite3.Connection, keep: str) -> None:
+        expired = conn.execute(
+            "DELETE FROM results WHERE expires_at <= ?", (time.time(),)
+        ).rowcount
+        self._count_evictions(conn, "expired", expired)
+
+        (count,) = conn.execute("SELECT COUNT(*) FROM results").fetchone()
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM results WHERE token IN ("
+                "  SELECT token FROM results ORDER BY last_used LIMIT ?"
+                ")",
+                (count - self.max_entries,),
+            )
+            self._count_evictions(conn, "max_entries", count - self.max_entries)
+
+        # Drop least recently used entries until the byte budget fits,
+        # always keeping the entry that was just written
+        (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()
+        dropped = 0
+        if total > self.max_bytes:
+            for token, size in conn.execute(
+                "SELECT token, size FROM results WHERE token != ? ORDER BY last_used",
+                (keep,),
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM results WHERE token = ?", (token,))
+                total -= size
+                dropped += 1
+        self._count_evictions(conn, "max_bytes", dropped)
+
+    @staticmethod
+    def _count_evictions(conn: sqlite3.Connection, reason: str, n: int) -> None:
+        if n > 0:
+            conn.execute(
+                "INSERT INTO results_evictions (reason, count) VALUES (?, ?) "
+                "ON CONFLICT(reason) DO UPDATE SET count = count + excluded.count",
+                (reason, n),
+            )
+
+    def stats(self) -> dict:
+        conn = self._conn()
+        entries, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()
+        evictions = {"expired": 0, "max_entries": 0, "max_bytes": 0}
+        evictions.update(conn.execute("SELECT reason, count FROM results_evictions"))
+        return {
+            "entries": entries,
+            "bytes": total,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "evictions": evictions,
+        }
+
+
+def create_results_store(backend: str, **limits) -> ResultsStore | SQLiteResultsStore:
+    """Build the store selected by `backend` ("sqlite" or "memory")."""
+    if backend == "memory":
+        return ResultsStore(**limits)
+    if backend == "sqlite":
+        return SQLiteResultsStore(**limits)
+    raise ValueError(f"Unknown results store backend: {backend!r}")
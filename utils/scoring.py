@@ -13,6 +13,17 @@ Poäng av 100:
 
 from __future__ import annotations
 
+from collections.abc import Sequence
+from functools import lru_cache
+
+# Profile fields that calculate_score reads. Two profiles with equal values
+# here get identical scores, so this tuple is the memoisation key.
+_SCORED_FIELDS = (
+    "rating", "review_count", "photo_count",
+    "has_website", "has_phone", "has_hours", "has_specific_categories",
+    "has_description", "reviews_responded", "reviews_returned",
+)
+
 
 def _rating_score(rating: float) -> float:
     if not rating:
@@ -163,7 +174,53 @@ def _get_recommendations(scores: dict, business: dict, top_competitor_name: str
     return tips
 
 
-def calculate_score(business: dict, competitors: list[dict], top_competitor_name: str | None = None) -> dict:
+class LazyRecommendations(Sequence):
+    """
+    Rekommendationslista som byggs först när den läses (iteration, len,
+    indexering). Mallar och PDF:en som aldrig läser den betalar inget för
+    de långa f-strängarna.
+    """
+
+    __slots__ = ("_scores", "_business", "_top_competitor_name", "_tips")
+
+    def __init__(self, scores: dict, business: dict, top_competitor_name: str | None = None):
+        self._scores = scores
+        self._business = business
+        self._top_competitor_name = top_competitor_name
+        self._tips: list[str] | None = None
+
+    def _render(self) -> list[str]:
+        if self._tips is None:
+            self._tips = _get_recommendations(
+                self._scores, self._business, self._top_competitor_name,
+            )
+        return self._tips
+
+    def __getitem__(self, index):
+        return self._render()[index]
+
+    def __len__(self) -> int:
+        return len(self._render())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        state = "pending" if self._tips is None else repr(self._tips)
+        return f"LazyRecommendations({state})"
+
+    def __reduce__(self):
+        # Pickle (e.g. to the PDF render pool) as the rendered list
+        return (list, (self._render(),))
+
+
+def calculate_numeric_score(business: dict, competitors: list[dict]) -> dict:
+    """
+    Alla delpoäng, total och betyg — utan rekommendationstexter.
+    Räcker för konkurrenter och batchkörningar.
+    """
     comp_review_counts = sorted(c["review_count"] for c in competitors if c["review_count"])
     if comp_review_counts:
         # Use median so one large chain with 10 000 reviews doesn't tank the score
@@ -209,7 +266,6 @@ def calculate_score(business: dict, competitors: list[dict], top_competitor_name
         "competitor_avg_reviews": round(competitor_avg, 1),
     }
 
-    scores["recommendations"] = _get_recommendations(scores, business, top_competitor_name)
     scores["grade"] = _grade(total)
 
     scores["max_scores"] = {
@@ -224,6 +280,46 @@ def calculate_score(business: dict, competitors: list[dict], top_competitor_name
     return scores
 
 
+def calculate_score(business: dict, competitors: list[dict], top_competitor_name: str | None = None) -> dict:
+    """
+    Som calculate_numeric_score, plus `recommendations` — en
+    LazyRecommendations som renderar texterna först när de läses.
+    """
+    return with_recommendations(
+        calculate_numeric_score(business, competitors), business, top_competitor_name,
+    )
+
+
+def with_recommendations(scores: dict, business: dict, top_competitor_name: str | None = None) -> dict:
+    """
+    Kopia av `scores` från calculate_numeric_score med `recommendations`
+    tillagda. Används där texterna faktiskt visas (PDF:en).
+    """
+    scores = dict(scores)
+    scores["recommendations"] = LazyRecommendations(scores, business, top_competitor_name)
+    return scores
+
+
+def profile_fingerprint(profile: dict) -> tuple:
+    """Hashbar nyckel av de profilfält som påverkar poängen."""
+    return tuple(profile.get(f) for f in _SCORED_FIELDS)
+
+
+@lru_cache(maxsize=4096)
+def _total_for_fingerprint(fingerprint: tuple) -> int:
+    profile = {f: v for f, v in zip(_SCORED_FIELDS, fingerprint) if v is not None}
+    return calculate_numeric_score(profile, [])["total"]
+
+
+def score_total(profile: dict) -> int:
+    """
+    Fristående totalpoäng för en profil (utan konkurrentjämförelse), t.ex.
+    för konkurrenttabellen. Memoiseras per profilfingeravtryck, så samma
+    konkurrent poängsätts bara en gång oavsett hur många rapporter den syns i.
+    """
+    return _total_for_fingerprint(profile_fingerprint(profile))
+
+
 def _grade(total: int) -> str:
     if total >= 85:
         return "A"
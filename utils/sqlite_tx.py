@@ -0,0 +1,56 @@
+"""
+Shared SQLite plumbing for the stores that live on local disk (results, job
+state, webhook outbox, caches, metrics, Places usage): per-thread
+connections and explicit transactions.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Iterable
+
+# Default file for the stores that hold per-lead state (results, jobs,
+# webhook outbox, Places usage), shared by every gunicorn worker on the host
+RESULTS_DB_PATH = os.getenv(
+    "RESULTS_DB_PATH",
+    os.path.join(tempfile.gettempdir(), "visibility_results.sqlite3"),
+)
+
+
+def connect(
+    local: threading.local,
+    path: str,
+    schema: Iterable[str] = (),
+    timeout: float = 5,
+) -> sqlite3.Connection:
+    """
+    Return the calling thread's connection to `path`, kept on `local`. It is
+    opened on first use, and again after a fork: one connection per thread
+    and per process. New connections are autocommit, in WAL mode, and run
+    the `schema` statements (CREATE … IF NOT EXISTS) once.
+    """
+    conn = getattr(local, "conn", None)
+    if conn is None or local.pid != os.getpid():
+        conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in schema:
+            conn.execute(statement)
+        local.conn, local.pid = conn, os.getpid()
+    return conn
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection):
+    """BEGIN IMMEDIATE … COMMIT/ROLLBACK on an autocommit connection."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
@@ -0,0 +1,254 @@
+"""
+Durable webhook outbox.
+
+Payloads are appended to a SQLite table and delivered by a small fixed set
+of worker threads, so a slow endpoint never ties up more than those threads
+and a worker restart loses nothing — undelivered rows are picked up again by
+whichever worker runs next.
+
+Delivery rules:
+  - Failed deliveries are retried with exponential backoff (plus jitter)
+    until `max_attempts`, then marked failed. 4xx responses other than 408
+    and 429 fail immediately — retrying will not fix the payload.
+  - With `batch_size > 1`, up to that many payloads are POSTed as one JSON
+    array. Only enable it for endpoints that accept arrays.
+  - Rows claimed by a worker that dies are reclaimed once their lease runs out.
+  - Failed rows stay in the table until replayed (see replay()).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Callable
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils import metrics
+from utils.sqlite_tx import connect, transaction
+
+logger = logging.getLogger(__name__)
+
+# Permanent failures: the request itself is wrong, so retrying cannot help
+_RETRYABLE_4XX = {408, 429}
+
+_OUTBOX_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS webhook_outbox ("
+    "  id INTEGER PRIMARY KEY AUTOINCREMENT,"
+    "  payload TEXT NOT NULL,"
+    "  status TEXT NOT NULL,"           # pending | sending | delivered | failed
+    "  attempts INTEGER NOT NULL DEFAULT 0,"
+    "  next_attempt_at REAL NOT NULL,"
+    "  created_at REAL NOT NULL,"
+    "  updated_at REAL NOT NULL,"
+    "  last_error TEXT"
+    ")",
+    "CREATE INDEX IF NOT EXISTS webhook_outbox_due "
+    "ON webhook_outbox (status, next_attempt_at)",
+)
+
+
+class WebhookOutbox:
+    """
+    SQLite-backed outbox for one webhook endpoint. `url` is called before
+    every delivery, so the target can change (or be unset) without a restart.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        url: Callable[[], str],
+        workers: int = 2,
+        batch_size: int = 1,
+        max_attempts: int = 8,
+        backoff_base: float = 5.0,
+        backoff_max: float = 3600.0,
+        timeout: float = 10.0,
+        poll_interval: float = 2.0,
+        lease: float = 60.0,
+        retention: float = 7 * 24 * 3600,
+    ):
+        self.path = path
+        self.url = url
+        self.workers = workers
+        self.batch_size = max(batch_size, 1)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.retention = retention
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._start_lock = threading.Lock()
+        self._started_pid: int | None = None
+        self._session: requests.Session | None = None
+
+    # ── Storage ───────────────────────────────────────────────────────────────
+
+    def _conn(self) -> sqlite3.Connection:
+        return connect(self._local, self.path, _OUTBOX_SCHEMA, timeout=10)
+
+    def enqueue(self, payload: dict) -> int:
+        """Append a payload to the outbox and wake a delivery worker. Returns its id."""
+        now = time.time()
+        cur = self._conn().execute(
+            "INSERT INTO webhook_outbox "
+            "(payload, status, next_attempt_at, created_at, updated_at) "
+            "VALUES (?, 'pending', ?, ?, ?)",
+            (json.dumps(payload), now, now, now),
+        )
+        metrics.inc(metrics.WEBHOOK_DELIVERIES, result="queued")
+        self.start()
+        self._wake.set()
+        return cur.lastrowid
+
+    def _claim(self) -> list[tuple[int, int, dict]]:
+        """
+        Lease up to batch_size due rows to this worker. A 'sending' row whose
+        lease has expired belonged to a worker that died mid-delivery.
+        """
+        conn = self._conn()
+        now = time.time()
+        with transaction(conn):
+            rows = conn.execute(
+                "SELECT id, attempts, payload FROM webhook_outbox "
+                "WHERE status IN ('pending', 'sending') AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at, id LIMIT ?",
+                (now, self.batch_size),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE webhook_outbox SET status = 'sending', next_attempt_at = ?, "
+                "updated_at = ? WHERE id = ?",
+                [(now + self.lease, now, row[0]) for row in rows],
+            )
+        return [(row_id, attempts, json.loads(payload)) for row_id, attempts, payload in rows]
+
+    def _mark_delivered(self, ids: list[int]) -> None:
+        now = time.time()
+        conn = self._conn()
+        conn.executemany(
+            "UPDATE webhook_outbox SET status = 'delivered', attempts = attempts + 1, "
+            "updated_at = ?, last_error = NULL WHERE id = ?",
+            [(now, row_id) for row_id in ids],
+        )
+        conn.execute(
+            "DELETE FROM webhook_outbox WHERE status = 'delivered' AND updated_at <= ?",
+            (now - self.retention,),
+        )
+
+    def _mark_failed(self, rows: list[tuple[int, int, dict]], error: str, permanent: bool) -> None:
+        now = time.time()
+        updates = []
+        for row_id, attempts, _ in rows:
+            attempts += 1
+            if permanent or attempts >= self.max_attempts:
+                status, next_at = "failed", now
+            else:
+                delay = min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max)
+                status, next_at = "pending", now + delay * random.uniform(0.8, 1.2)
+            updates.append((status, attempts, next_at, now, error[:500], row_id))
+            metrics.inc(metrics.WEBHOOK_DELIVERIES, result="failed" if status == "failed" else "retry")
+        self._conn().executemany(
+            "UPDATE webhook_outbox SET status = ?, attempts = ?, next_attempt_at = ?, "
+            "updated_at = ?, last_error = ? WHERE id = ?",
+            updates,
+        )
+
+    # ── Delivery ──────────────────────────────────────────────────────────────
+
+    def start(self) -> None:
+        """Start the delivery workers for this process (idempotent, fork-aware)."""
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            self._session = requests.Session()
+            self._session.mount("https://", HTTPAdapter(pool_maxsize=self.workers))
+            self._session.mount("http://", HTTPAdapter(pool_maxsize=self.workers))
+            for i in range(self.workers):
+                threading.Thread(
+                    target=self._worker, name=f"webhook-outbox-{i}", daemon=True,
+                ).start()
+
+    def _worker(self) -> None:
+        while True:
+            try:
+                delivered = self.deliver_once()
+            except Exception:
+                logger.exception("Webhook outbox worker error")
+                delivered = 0
+            if not delivered:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def deliver_once(self) -> int:
+        """Claim and send one batch. Returns the number of rows claimed."""
+        url = self.url()
+        if not url:
+            return 0
+        rows = self._claim()
+        if not rows:
+            return 0
+
+        payloads = [payload for _, _, payload in rows]
+        body = payloads if self.batch_size > 1 else payloads[0]
+        try:
+            resp = self._session.post(url, json=body, timeout=self.timeout)
+            resp.raise_for_status()
+        except requests.HTTPError as exc:
+            status = exc.response.status_code
+            permanent = 400 <= status < 500 and status not in _RETRYABLE_4XX
+            logger.error("GHL webhook failed (%d payloads): %s", len(rows), exc)
+            self._mark_failed(rows, str(exc), permanent)
+        except requests.RequestException as exc:
+            logger.error("GHL webhook failed (%d payloads): %s", len(rows), exc)
+            self._mark_failed(rows, str(exc), permanent=False)
+        else:
+            logger.info("GHL webhook fired — %d payloads, status %s", len(rows), resp.status_code)
+            metrics.inc(metrics.WEBHOOK_DELIVERIES, len(rows), result="sent")
+            self._mark_delivered([row_id for row_id, _, _ in rows])
+        return len(rows)
+
+    # ── Maintenance ───────────────────────────────────────────────────────────
+
+    def replay(self, ids: list[int] | None = None) -> int:
+        """Queue failed rows (all of them, or just `ids`) for a fresh round of attempts."""
+        now = time.time()
+        query = (
+            "UPDATE webhook_outbox SET status = 'pending', attempts = 0, "
+            "next_attempt_at = ?, updated_at = ? WHERE status = 'failed'"
+        )
+        params: list = [now, now]
+        if ids:
+            query += f" AND id IN ({','.join('?' * len(ids))})"
+            params += ids
+        replayed = self._conn().execute(query, params).rowcount
+        self._wake.set()
+        return replayed
+
+    def failed(self, limit: int = 50) -> list[dict]:
+        rows = self._conn().execute(
+            "SELECT id, attempts, updated_at, last_error, payload FROM webhook_outbox "
+            "WHERE status = 'failed' ORDER BY id LIMIT ?",
+            (limit,),
+        ).fetchall()
+        return [
+            {"id": r[0], "attempts": r[1], "failed_at": r[2], "error": r[3], "payload": json.loads(r[4])}
+            for r in rows
+        ]
+
+    def stats(self) -> dict:
+        counts = {"pending": 0, "sending": 0, "delivered": 0, "failed": 0}
+        counts.update(self._conn().execute(
+            "SELECT status, COUNT(*) FROM webhook_outbox GROUP BY status"
+        ))
+        return counts
+
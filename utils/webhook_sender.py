@@ -0,0 +1,115 @@
+"""
+Bounded in-memory webhook sender.
+
+A fixed pool of threads drains a capped queue and POSTs through one pooled
+HTTP session. When the queue is full, new payloads are dropped (and counted)
+instead of spawning more threads — a slow endpoint costs at most `workers`
+blocked sockets. Nothing survives a restart; use WebhookOutbox when every
+lead must be delivered.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Callable
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_QUEUE_DEPTH = metrics.gauge(
+    "visibility_webhook_queue_depth", "Webhook payloads waiting in a worker's bounded queue.",
+)
+WEBHOOK_LATENCY = metrics.histogram(
+    "visibility_webhook_delivery_seconds", "Time from queueing a webhook payload to its delivery.",
+)
+
+
+class BoundedWebhookSender:
+    """
+    `submit(payload)` returns immediately: True if the payload was queued,
+    False if the queue was full and it was dropped. `url` is called before
+    every delivery.
+    """
+
+    def __init__(
+        self,
+        url: Callable[[], str],
+        workers: int = 2,
+        queue_size: int = 100,
+        timeout: float = 10.0,
+    ):
+        self.url = url
+        self.workers = max(workers, 1)
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._queue: queue.Queue | None = None
+        self._session: requests.Session | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+
+    def _start(self) -> queue.Queue:
+        # Threads do not survive a fork, so each process starts its own pool
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.queue_size)
+                self._session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+                self._session.mount("https://", adapter)
+                self._session.mount("http://", adapter)
+                self._pid = os.getpid()
+                for i in range(self.workers):
+                    threading.Thread(
+                        target=self._worker, name=f"webhook-{i}", daemon=True,
+                    ).start()
+            return self._queue
+
+    def submit(self, payload: dict) -> bool:
+        q = self._start()
+        try:
+            q.put_nowait((time.monotonic(), payload))
+        except queue.Full:
+            self._count("dropped")
+            logger.error("GHL webhook queue full (%d) — dropping lead", self.queue_size)
+            return False
+        self._count("queued")
+        metrics.set_gauge(WEBHOOK_QUEUE_DEPTH, q.qsize(), per_process=True)
+        return True
+
+    def _count(self, key: str) -> None:
+        metrics.inc(metrics.WEBHOOK_DELIVERIES, result=key)
+
+    def _worker(self) -> None:
+        q = self._queue
+        while True:
+            queued_at, payload = q.get()
+            try:
+                self._deliver(payload)
+            except Exception:
+                logger.exception("Webhook sender worker error")
+            finally:
+                # Time from submit() to done, so queueing delay shows up too
+                metrics.observe(WEBHOOK_LATENCY, time.monotonic() - queued_at)
+                metrics.set_gauge(WEBHOOK_QUEUE_DEPTH, q.qsize(), per_process=True)
+                q.task_done()
+
+    def _deliver(self, payload: dict) -> None:
+        url = self.url()
+        if not url:
+            logger.warning("GHL webhook URL not configured — skipping.")
+            return
+        try:
+            resp = self._session.post(url, json=payload, timeout=self.timeout)
+            resp.raise_for_status()
+            logger.info("GHL webhook fired — status %s", resp.status_code)
+            self._count("sent")
+        except requests.RequestException as exc:
+            logger.error("GHL webhook failed: %s", exc)
+            self._count("failed")